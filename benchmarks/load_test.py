@@ -0,0 +1,267 @@
+"""Load generator for the bot's command handlers.
+
+Drives the real handlers in main.py with stubbed interactions against the
+simulated container runtime (main.SimulatedBackend), and reports throughput, latency percentiles
+and event loop lag per command at increasing concurrency.
+
+    python benchmarks/load_test.py --concurrency 1 8 32 128 --requests 200
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# main.py writes its log and database relative to the working directory
+ORIGINAL_CWD = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix="bot-load-"))
+
+import main  # noqa: E402
+
+ERROR_COLOR = 0xff0000
+IMAGE = next(iter(main.DOCKER_IMAGES))
+user_ids = itertools.count(10_000)
+
+
+class FakeMessage:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+
+    async def edit(self, embed=None, view=None, **kwargs):
+        await self.interaction.record(embed)
+
+
+class FakeUser:
+    def __init__(self, user_id: int, interaction: "FakeInteraction"):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.interaction = interaction
+
+    async def send(self, embed=None, **kwargs):
+        await self.interaction.record(embed)
+
+
+class FakeResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+        self.done = False
+
+    def is_done(self) -> bool:
+        return self.done
+
+    async def send_message(self, content=None, embed=None, view=None, ephemeral=False):
+        self.done = True
+        await self.interaction.record(embed)
+
+    async def edit_message(self, embed=None, view=None, **kwargs):
+        self.done = True
+        await self.interaction.record(embed)
+
+    async def defer(self, **kwargs):
+        self.done = True
+        await self.interaction.record(None)
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+
+    async def send(self, content=None, embed=None, view=None, **kwargs):
+        await self.interaction.record(embed)
+        return FakeMessage(self.interaction)
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for the handlers in main.py"""
+
+    def __init__(self, user_id: int, discord_latency: float):
+        self.user = FakeUser(user_id, self)
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.data = {}
+        self.discord_latency = discord_latency
+        self.failed = False
+
+    async def record(self, embed):
+        if self.discord_latency:
+            await asyncio.sleep(self.discord_latency)
+        if embed is not None and embed.color is not None and embed.color.value == ERROR_COLOR:
+            self.failed = True
+
+
+# Each handler gets an interaction from the owner of `container_id`, a seeded
+# instance, except /deploy which always runs as a fresh user to stay under
+# SERVER_LIMIT.
+async def run_deploy(interaction: FakeInteraction, container_id: str):
+    await interaction.response.defer()
+    await main.create_server_task(interaction, IMAGE)
+
+
+async def run_info(interaction: FakeInteraction, container_id: str):
+    await main.show_instance_info(interaction, container_id[:12])
+
+
+async def run_list(interaction: FakeInteraction, container_id: str):
+    await main.list_instances.callback(interaction)
+
+
+async def run_stats(interaction: FakeInteraction, container_id: str):
+    await main.stats.callback(interaction)
+
+
+async def run_logs(interaction: FakeInteraction, container_id: str):
+    await main.logs.callback(interaction, container_id[:12], main.LOGS_DEFAULT_LINES)
+
+
+async def run_exec(interaction: FakeInteraction, container_id: str):
+    await main.exec_command.callback(interaction, container_id[:12], "uptime")
+
+
+COMMANDS = {
+    "deploy": run_deploy,
+    "info": run_info,
+    "list": run_list,
+    "stats": run_stats,
+    "logs": run_logs,
+    "exec": run_exec,
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def measure_loop_lag(samples: List[float], interval: float, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+async def seed_instances(count: int) -> List[Tuple[int, str]]:
+    instances = []
+    for _ in range(count):
+        user_id = next(user_ids)
+        container_id = await main.orchestrate("run_container", main.DOCKER_IMAGES[IMAGE]['name'], str(user_id))
+        await main.orchestrate("add_to_database", str(user_id), container_id, "ssh seeded@tmate.io", IMAGE)
+        instances.append((user_id, container_id))
+    return instances
+
+
+async def run_level(command: str, concurrency: int, requests: int, instances: List[Tuple[int, str]],
+                    discord_latency: float, lag_interval: float) -> Dict:
+    handler = COMMANDS[command]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    lag_samples = []
+    failures = 0
+
+    async def one(index: int):
+        nonlocal failures
+        user_id, container_id = instances[index % len(instances)]
+        if command == "deploy":
+            user_id = next(user_ids)
+
+        async with semaphore:
+            interaction = FakeInteraction(user_id, discord_latency)
+            started = time.perf_counter()
+            try:
+                await handler(interaction, container_id)
+            except Exception:
+                interaction.failed = True
+            latencies.append(time.perf_counter() - started)
+            if interaction.failed:
+                failures += 1
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(lag_samples, lag_interval, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_task
+
+    return {
+        "command": command,
+        "concurrency": concurrency,
+        "requests": requests,
+        "failures": failures,
+        "throughput": requests / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "loop_lag_mean_ms": (statistics.fmean(lag_samples) * 1000) if lag_samples else 0.0,
+        "loop_lag_max_ms": (max(lag_samples) * 1000) if lag_samples else 0.0,
+    }
+
+
+def print_table(results: List[Dict]):
+    header = f"{'command':<8} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'lag avg':>8} {'lag max':>8} {'fail':>5}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['command']:<8} {r['concurrency']:>5} {r['throughput']:>9.1f} {r['p50_ms']:>9.1f} "
+            f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['loop_lag_mean_ms']:>8.2f} "
+            f"{r['loop_lag_max_ms']:>8.2f} {r['failures']:>5}"
+        )
+
+
+async def run(args) -> List[Dict]:
+    latencies = {
+        "create": args.run_latency,
+        "stats": args.stats_latency,
+        "exec": args.exec_latency,
+        "list": args.list_latency,
+    }
+    main.runtime = main.SimulatedBackend(latencies, images=[img["name"] for img in main.DOCKER_IMAGES.values()])
+    main.host_sampler.start()
+    instances = await seed_instances(args.seed)
+
+    results = []
+    for command in args.commands:
+        for concurrency in args.concurrency:
+            results.append(await run_level(
+                command, concurrency, args.requests, instances, args.discord_latency, args.lag_interval
+            ))
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", nargs="+", choices=sorted(COMMANDS), default=["deploy", "info", "list", "stats"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per command and concurrency level")
+    parser.add_argument("--seed", type=int, default=100, help="Instances created before the run")
+    parser.add_argument("--run-latency", type=float, default=0.05, help="Seconds per container create")
+    parser.add_argument("--stats-latency", type=float, default=0.1, help="Seconds per container stats call")
+    parser.add_argument("--exec-latency", type=float, default=0.02, help="Seconds per exec (tmate) call")
+    parser.add_argument("--list-latency", type=float, default=0.01, help="Seconds per containers.list")
+    parser.add_argument("--discord-latency", type=float, default=0.0, help="Seconds per Discord API response")
+    parser.add_argument("--lag-interval", type=float, default=0.01, help="Loop lag sampling interval")
+    parser.add_argument("--json", metavar="PATH", help="Also write results to a JSON file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_table(results)
+
+    if args.json:
+        with open(os.path.join(ORIGINAL_CWD, args.json), 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,262 @@
+"""Microbenchmarks for the database.json persistence functions in main.py.
+
+Generates synthetic databases of each requested size and times the
+persistence functions against them. It records wall time, allocations
+(tracemalloc) and bytes written per call. Results are saved as JSON so
+storage changes can be compared across commits:
+
+    python benchmarks/persistence_bench.py --sizes 10 1000 100000
+    python benchmarks/persistence_bench.py --compare benchmarks/results/persistence-<old>.json
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+sys.path.insert(0, REPO_ROOT)
+
+# main.py writes its log and database relative to the working directory
+ORIGINAL_CWD = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix="bot-persistence-"))
+
+import main  # noqa: E402
+
+IMAGE = next(iter(main.DOCKER_IMAGES))
+
+
+def generate_database(size: int, rng: random.Random) -> Dict:
+    """Spread `size` instances over users holding 1..SERVER_LIMIT instances each"""
+    data = {}
+    created = datetime.datetime(2025, 1, 1)
+    remaining = size
+    while remaining:
+        user_id = str(rng.randrange(10 ** 17, 10 ** 18))
+        count = min(remaining, rng.randint(1, main.SERVER_LIMIT))
+        data[user_id] = [{
+            "container_id": uuid.UUID(int=rng.getrandbits(128)).hex * 2,
+            "ssh_command": f"ssh {uuid.UUID(int=rng.getrandbits(128)).hex[:26]}@nyc1.tmate.io",
+            "image": IMAGE,
+            "created_at": (created + datetime.timedelta(seconds=rng.randrange(10 ** 7))).isoformat(),
+            "status": rng.choice(["running", "stopped"])
+        } for _ in range(count)]
+        remaining -= count
+    return data
+
+
+def instance_ids(data: Dict) -> List[Tuple[str, str]]:
+    return [(user_id, c["container_id"]) for user_id, containers in data.items() for c in containers]
+
+
+def change_status_tick():
+    """The database part of one change_status() iteration"""
+    return main.count_all_containers()
+
+
+# Each benchmark returns (call, teardown) for one iteration; only `call` is measured.
+def bench_add(ids, rng):
+    user_id = rng.choice(ids)[0]
+    container_id = uuid.UUID(int=rng.getrandbits(128)).hex * 2
+    return (lambda: main.add_to_database(user_id, container_id, "ssh bench@nyc1.tmate.io", IMAGE),
+            lambda: main.remove_from_database(container_id))
+
+
+def bench_remove(ids, rng):
+    user_id, container_id = rng.choice(ids)
+    record = main.get_container_info(container_id)
+    return (lambda: main.remove_from_database(container_id),
+            lambda: main.add_to_database(user_id, container_id, record["ssh_command"], record["image"]))
+
+
+def bench_update_status(ids, rng):
+    container_id = rng.choice(ids)[1]
+    return lambda: main.update_container_status(container_id, rng.choice(["running", "stopped"])), None
+
+
+def bench_get_info(ids, rng):
+    container_id = rng.choice(ids)[1]
+    return lambda: main.get_container_info(container_id[:12]), None
+
+
+def bench_get_user(ids, rng):
+    user_id = rng.choice(ids)[0]
+    return lambda: main.get_user_containers(user_id), None
+
+
+def bench_change_status(ids, rng):
+    return change_status_tick, None
+
+
+BENCHMARKS: Dict[str, Callable] = {
+    "add_to_database": bench_add,
+    "remove_from_database": bench_remove,
+    "update_container_status": bench_update_status,
+    "get_container_info": bench_get_info,
+    "get_user_containers": bench_get_user,
+    "change_status": bench_change_status,
+}
+
+
+def file_size() -> int:
+    return os.path.getsize(main.DATABASE_FILE) if os.path.exists(main.DATABASE_FILE) else 0
+
+
+def count_bytes_written(call: Callable) -> int:
+    """Bytes handed to file writes during `call`"""
+    written = 0
+    real_open = open
+
+    class CountingFile:
+        def __init__(self, f):
+            self.f = f
+
+        def write(self, chunk):
+            nonlocal written
+            written += len(chunk.encode() if isinstance(chunk, str) else chunk)
+            return self.f.write(chunk)
+
+        def __getattr__(self, name):
+            return getattr(self.f, name)
+
+        def __enter__(self):
+            self.f.__enter__()
+            return self
+
+        def __exit__(self, *exc):
+            return self.f.__exit__(*exc)
+
+    def counting_open(file, mode='r', *args, **kwargs):
+        f = real_open(file, mode, *args, **kwargs)
+        return CountingFile(f) if any(flag in mode for flag in "wax+") else f
+
+    main.open = counting_open
+    try:
+        call()
+    finally:
+        del main.open
+    return written
+
+
+def run_benchmark(name: str, ids: List[Tuple[str, str]], iterations: int, budget: float, rng: random.Random) -> Dict:
+    make = BENCHMARKS[name]
+    timings = []
+    deadline = time.perf_counter() + budget
+
+    while len(timings) < iterations and (not timings or time.perf_counter() < deadline):
+        call, teardown = make(ids, rng)
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+        if teardown:
+            teardown()
+
+    # Allocation and write accounting run separately so they don't skew timings
+    call, teardown = make(ids, rng)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    written = count_bytes_written(call)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if teardown:
+        teardown()
+
+    return {
+        "op": name,
+        "iterations": len(timings),
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "max_ms": max(timings) * 1000,
+        "peak_alloc_bytes": peak - baseline,
+        "retained_alloc_bytes": current - baseline,
+        "bytes_written": written,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: List[Dict], baseline: Optional[Dict] = None):
+    previous = {}
+    if baseline:
+        previous = {(r["size"], r["op"]): r for r in baseline["results"]}
+
+    header = f"{'size':>7} {'op':<24} {'mean ms':>10} {'min ms':>10} {'peak KiB':>10} {'written KiB':>12}"
+    if previous:
+        header += f" {'mean Δ':>8}"
+    print(header)
+    print("-" * len(header))
+
+    for r in results:
+        line = (
+            f"{r['size']:>7} {r['op']:<24} {r['mean_ms']:>10.3f} {r['min_ms']:>10.3f} "
+            f"{r['peak_alloc_bytes'] / 1024:>10.1f} {r['bytes_written'] / 1024:>12.1f}"
+        )
+        old = previous.get((r["size"], r["op"]))
+        if old and old["mean_ms"]:
+            line += f" {(r['mean_ms'] / old['mean_ms'] - 1) * 100:>+7.1f}%"
+        print(line)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 1000, 100000])
+    parser.add_argument("--ops", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--iterations", type=int, default=50, help="Max timed calls per op and size")
+    parser.add_argument("--budget", type=float, default=5.0, help="Max seconds per op and size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/persistence-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare mean times against")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = []
+    for size in args.sizes:
+        data = generate_database(size, rng)
+        ids = instance_ids(data)
+        for op in args.ops:
+            # Start every op from the same file so earlier ops can't skew later ones
+            main.save_database(data)
+            result = run_benchmark(op, ids, args.iterations, args.budget, rng)
+            result["size"] = size
+            result["file_bytes"] = file_size()
+            results.append(result)
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(ORIGINAL_CWD, args.compare)) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f"persistence-{commit or 'unknown'}.json")
+    output = os.path.join(ORIGINAL_CWD, output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "results": results,
+        }, f, indent=4)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -5,6 +5,16 @@ import sys
 import os
 import re
 import time
+import threading
+import collections
+import array
+import heapq
+import mmap
+import operator
+import codecs
+import functools
+import abc
+import queue
 import concurrent.futures
 import discord
 from discord.ext import commands, tasks
@@ -24,6 +34,73 @@ DATABASE_FILE = 'database.json'  # Changed to JSON for better structure
 LOG_FILE = 'bot.log'
 ADMIN_IDS = [1360282267804500081]  # Add your admin user IDs here
 
+# Instance lifetime (images may override with a "ttl_days" entry, None means never expire)
+DEFAULT_TTL_DAYS = 30
+USER_TTL_DAYS = {}  # Per-user overrides, e.g. {"1360282267804500081": None}
+EXPIRY_WARNING = 24 * 3600  # Seconds before expiry that the owner gets a DM
+SWEEP_INTERVAL = 300  # Seconds between expiry/orphan sweeps
+
+# Persistent storage (one named volume per user, kept across /remove)
+VOLUME_MOUNT_PATH = '/data'  # Where the user's volume is mounted in every instance
+VOLUME_LABEL = 'vps-bot.owner'  # Volume label holding the owner's user ID
+VOLUME_QUOTA_BYTES = 10 * 1024 ** 3  # Per-user volume quota
+VOLUME_SCAN_CYCLE = 600  # Seconds to re-measure every volume once
+HOST_DISK_RESERVE_BYTES = 20 * 1024 ** 3  # Free host disk required to deploy or start
+VOLUME_QUOTA_GRACE = 15 * 60  # Seconds an over-quota user may run instances once to free up space
+CONTAINER_STORAGE_LIMIT = None  # e.g. '10G', needs overlay2 on xfs with pquota
+
+# Container runtime
+RUNTIME_BACKEND = 'docker'  # 'docker', or 'simulated' to run without a daemon (tests, benchmarks)
+DOCKER_BASE_URL = None  # e.g. 'unix:///run/user/1000/podman/podman.sock' for rootless Podman, None uses DOCKER_HOST
+
+# Cluster configuration (used by `python main.py cluster`)
+SHARD_COUNT = 4  # Total Discord shards across all workers
+CLUSTER_WORKERS = 2  # Shard worker processes, shards are spread round-robin
+ORCHESTRATOR_SOCKET = 'orchestrator.sock'  # Local IPC socket of the orchestration worker
+ORCHESTRATOR_THREADS = 8  # Threads running blocking runtime/database operations
+IPC_LINE_LIMIT = 16 * 1024 * 1024  # Max size of a single IPC message
+
+# Host statistics sampling (backs /stats)
+HOST_SAMPLE_INTERVAL = 5  # Seconds between host samples
+HOST_HISTORY_SECONDS = 15 * 60  # Ring buffer length, covers the 15-minute average
+CONTAINER_COUNT_INTERVAL = 300  # Seconds between container count refreshes, events trigger earlier ones
+CONTAINER_COUNT_EVENTS = {'create', 'start', 'die', 'pause', 'unpause', 'destroy'}
+SPARKLINE_POINTS = 30  # Points shown in /stats sparklines
+
+# Per-instance resource usage history (backs /info and /admin-top)
+USAGE_FILE = 'usage.bin'  # Memory-mapped time-series store
+USAGE_INDEX_FILE = 'usage.json'  # Container ID -> slot mapping for USAGE_FILE
+USAGE_MAX_CONTAINERS = 2048  # Slots in the store, changing this resets history
+USAGE_MINUTE_RETENTION = 24 * 3600  # Seconds of 1-minute rollups kept
+USAGE_HOUR_RETENTION = 30 * 24 * 3600  # Seconds of 1-hour rollups kept
+USAGE_SAMPLE_INTERVAL = 30  # Seconds between usage polls of all running containers
+USAGE_COLLECTOR_THREADS = 8  # Concurrent stats requests per poll
+USAGE_TOP_MAX_HOURS = 7 * 24  # Longest /admin-top window, each hour scans every slot once
+
+# Container limits and abuse detection (checked on every usage poll)
+CONTAINER_CPU_QUOTA = 200000  # Normal CPU quota (200% of one core)
+CONTAINER_CPU_SHARES = 512
+ABUSE_CPU_SATURATION = 0.9  # Fraction of the current CPU quota that counts as saturated
+ABUSE_CPU_SAMPLES = 10  # Consecutive saturated polls before acting
+ABUSE_PIDS_LIMIT = 2000  # Process count that looks like a fork bomb
+ABUSE_EGRESS_RATE = 20 * 1024 * 1024  # Smoothed bytes/s of network egress
+ABUSE_EGRESS_SMOOTHING = 0.2  # Weight of the newest sample in the egress average
+ABUSE_THROTTLED_CPU_QUOTA = 25000  # 25% of one core while throttled
+ABUSE_THROTTLED_CPU_SHARES = 64
+ABUSE_ESCALATE_SAMPLES = 10  # Polls still abusive while throttled before pausing
+ABUSE_RECOVERY_SAMPLES = 20  # Clean polls before throttling is lifted
+NOTIFICATION_INTERVAL = 10  # Seconds between notification deliveries
+
+# Output streaming for /logs and /exec
+STREAM_MAX_BYTES = 32 * 1024  # Output bytes shown per request
+STREAM_MAX_SECONDS = 30  # Wall time per request
+STREAM_PAGE_CHARS = 1900  # Characters per code-block message
+STREAM_EDIT_INTERVAL = 1.5  # Seconds between live edits of the current page
+STREAM_QUEUE_SIZE = 16  # Chunks buffered between the runtime reader and Discord
+STREAM_THREADS = 4  # Concurrent streams, separate from ORCHESTRATOR_THREADS
+LOGS_DEFAULT_LINES = 100
+LOGS_MAX_LINES = 2000
+
 # Available Docker images with metadata
 DOCKER_IMAGES = {
     "ubuntu-22.04": {
@@ -50,8 +127,9 @@ intents = discord.Intents.default()
 intents.messages = True
 intents.message_content = True
 
-bot = commands.Bot(command_prefix='/', intents=intents)
-client = docker.from_env()
+bot = commands.AutoShardedBot(command_prefix='/', intents=intents)
+runtime = None  # Container runtime backend, only connected in the process that owns orchestration
+database_lock = threading.RLock()
 
 class ImageSelectView(View):
     def __init__(self, user_id: int):
@@ -62,13 +140,7 @@ class ImageSelectView(View):
         # Create a dropdown for image selection
         select = Select(
             placeholder="Choose an OS image...",
-            options=[
-                discord.SelectOption(
-                    label=img["display_name"],
-                    description=img["description"],
-                    value=img_name
-                ) for img_name, img in DOCKER_IMAGES.items()
-            ]
+            options=list(image_options())
         )
         select.callback = self.select_callback
         self.add_item(select)
@@ -84,17 +156,7 @@ class ImageSelectView(View):
             return
             
         self.selected_image = interaction.data['values'][0]
-        img_data = DOCKER_IMAGES[self.selected_image]
-        
-        embed = discord.Embed(
-            title="Image Selected",
-            description=f"**{img_data['display_name']}** ready for deployment",
-            color=0x00ff00
-        )
-        embed.add_field(name="Description", value=img_data["description"], inline=False)
-        embed.add_field(name="Resources", value=f"{img_data['ram']} RAM | {img_data['cpu']} CPU", inline=False)
-        
-        await interaction.response.edit_message(embed=embed, view=self)
+        await interaction.response.edit_message(embed=image_selected_embed(self.selected_image), view=self)
     
     async def deploy_callback(self, interaction: discord.Interaction):
         if interaction.user.id != self.user_id:
@@ -109,6 +171,81 @@ class ImageSelectView(View):
         await create_server_task(interaction, self.selected_image)
         self.stop()
 
+# Persistent views
+# Control buttons carry the action and full container ID in their custom_id and are
+# routed by pattern, so no View is kept per message and buttons keep working after a restart.
+INSTANCE_BUTTONS = {
+    "stop": ("Stop", discord.ButtonStyle.red, "⏹️"),
+    "restart": ("Restart", discord.ButtonStyle.blurple, "🔄"),
+    "start": ("Start", discord.ButtonStyle.green, "▶️"),
+    "ssh": ("Regen SSH", discord.ButtonStyle.gray, "🔑"),
+    "remove": ("Remove", discord.ButtonStyle.red, "🗑️"),
+}
+
+class InstanceButton(discord.ui.DynamicItem[Button], template=r'instance:(?P<action>[a-z]+):(?P<container_id>[0-9a-f]{12,64})'):
+    def __init__(self, action: str, container_id: str):
+        label, style, emoji = INSTANCE_BUTTONS[action]
+        super().__init__(Button(label=label, style=style, emoji=emoji, custom_id=f"instance:{action}:{container_id}"))
+        self.action = action
+        self.container_id = container_id
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match):
+        if match['action'] not in INSTANCE_BUTTONS:
+            raise ValueError(f"Unknown instance action {match['action']}")
+        return cls(match['action'], match['container_id'])
+    
+    async def callback(self, interaction: discord.Interaction):
+        # Anyone can click a button in a shared channel, the handlers check ownership
+        if self.action == "ssh":
+            await regen_ssh_command(interaction, self.container_id)
+        else:
+            await manage_server(interaction, self.action, self.container_id)
+
+bot.add_dynamic_items(InstanceButton)
+
+def instance_view(container_id: str, running: bool) -> View:
+    """Controls for an instance; the view is not retained once sent since every item is dynamic"""
+    view = View(timeout=None)
+    for action in (("stop", "restart") if running else ("start",)) + ("ssh", "remove"):
+        view.add_item(InstanceButton(action, container_id))
+    return view
+
+# Cached embeds
+# Embeds that only depend on configuration are built once; callers must not modify them.
+@functools.lru_cache(maxsize=None)
+def image_options() -> tuple:
+    return tuple(
+        discord.SelectOption(
+            label=img["display_name"],
+            description=img["description"],
+            value=img_name
+        ) for img_name, img in DOCKER_IMAGES.items()
+    )
+
+@functools.lru_cache(maxsize=None)
+def image_selected_embed(image: str) -> discord.Embed:
+    img_data = DOCKER_IMAGES[image]
+    
+    embed = discord.Embed(
+        title="Image Selected",
+        description=f"**{img_data['display_name']}** ready for deployment",
+        color=0x00ff00
+    )
+    embed.add_field(name="Description", value=img_data["description"], inline=False)
+    embed.add_field(name="Resources", value=f"{img_data['ram']} RAM | {img_data['cpu']} CPU", inline=False)
+    return embed
+
+@functools.lru_cache(maxsize=None)
+def deploy_embed() -> discord.Embed:
+    embed = discord.Embed(
+        title="🚀 Deploy a New Instance",
+        description="Select an OS image from the dropdown below:",
+        color=0x3498db
+    )
+    embed.set_footer(text="You have 60 seconds to choose")
+    return embed
+
 # Database functions
 def load_database() -> Dict:
     if not os.path.exists(DATABASE_FILE):
@@ -120,125 +257,1871 @@ def load_database() -> Dict:
         except json.JSONDecodeError:
             return {}
 
-def save_database(data: Dict):
-    with open(DATABASE_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+def save_database(data: Dict):
+    # Readers don't take database_lock, so the file is replaced atomically and is never seen half-written
+    temp_file = f"{DATABASE_FILE}.tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(temp_file, DATABASE_FILE)
+
+def add_to_database(user_id: str, container_id: str, ssh_command: str, image_name: str):
+    with database_lock:
+        data = load_database()
+        
+        if user_id not in data:
+            data[user_id] = []
+        
+        created_at = datetime.datetime.now()
+        ttl = instance_ttl(user_id, image_name)
+        expires_at = created_at + ttl if ttl else None
+        
+        data[user_id].append({
+            "container_id": container_id,
+            "ssh_command": ssh_command,
+            "image": image_name,
+            "created_at": created_at.isoformat(),
+            "expires_at": expires_at.isoformat() if expires_at else None,
+            "status": "running"
+        })
+        
+        save_database(data)
+    
+    if expires_at:
+        expiry_scheduler.schedule(container_id, expires_at.timestamp())
+
+def instance_ttl(user_id: str, image_name: str) -> Optional[datetime.timedelta]:
+    if user_id in USER_TTL_DAYS:
+        days = USER_TTL_DAYS[user_id]
+    else:
+        days = DOCKER_IMAGES.get(image_name, {}).get("ttl_days", DEFAULT_TTL_DAYS)
+    return datetime.timedelta(days=days) if days else None
+
+def remove_from_database(container_id: str):
+    with database_lock:
+        data = load_database()
+        
+        for user_id, containers in data.items():
+            data[user_id] = [c for c in containers if c["container_id"] != container_id]
+        
+        save_database(data)
+
+def update_container_status(container_id: str, status: str):
+    with database_lock:
+        data = load_database()
+        
+        for user_id, containers in data.items():
+            for container in containers:
+                if container["container_id"] == container_id:
+                    container["status"] = status
+        
+        save_database(data)
+
+def update_ssh_command(container_id: str, ssh_command: str):
+    with database_lock:
+        data = load_database()
+        
+        for user_id, containers in data.items():
+            for container in containers:
+                if container["container_id"] == container_id:
+                    container["ssh_command"] = ssh_command
+        
+        save_database(data)
+
+def get_user_containers(user_id: str) -> List[Dict]:
+    data = load_database()
+    return data.get(str(user_id), [])
+
+def count_user_containers(user_id: str) -> int:
+    return len(get_user_containers(user_id))
+
+def managed_container_ids() -> set:
+    """IDs of every instance the bot created, as opposed to other containers on the host"""
+    data = load_database()
+    return {container["container_id"] for containers in data.values() for container in containers}
+
+def count_all_containers() -> int:
+    data = load_database()
+    return sum(len(containers) for containers in data.values())
+
+def get_container_info(container_id: str) -> Optional[Dict]:
+    """Look up an instance by full ID or ID prefix, including its owner's user_id"""
+    data = load_database()
+    
+    for user_id, containers in data.items():
+        for container in containers:
+            if container["container_id"].startswith(container_id):
+                return {**container, "user_id": user_id}
+    return None
+
+# Container runtime backends
+class RuntimeBackend(abc.ABC):
+    """Operations the bot needs from a container runtime.
+    
+    Containers are addressed by full ID and described with plain dicts, so no
+    SDK objects leak into the rest of the bot. Backends raise
+    docker.errors.NotFound for unknown containers and other
+    docker.errors.DockerException subclasses for runtime failures, which is
+    what the handlers and the orchestrator IPC already expect.
+    """
+    
+    @abc.abstractmethod
+    def image_exists(self, image: str) -> bool:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def pull_image(self, image: str):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def ensure_volume(self, name: str, labels: Dict[str, str]):
+        """Create the named volume unless it already exists"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def list_volumes(self, label: str) -> List[Dict]:
+        """Volumes carrying `label` as {'name', 'mountpoint', 'labels'}; mountpoint may be None"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def volume_sizes(self) -> Dict[str, int]:
+        """Size in bytes of every volume as reported by the runtime itself"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def create(self, image: str, volumes: Dict[str, str], mem_limit: str, cpu_quota: int,
+               cpu_shares: int, storage_limit: Optional[str] = None) -> str:
+        """Create and start a container with `volumes` ({name: mount path}) and return its ID"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def status(self, container_id: str) -> str:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def list_containers(self, all: bool = False) -> List[Dict]:
+        """Containers as {'id', 'status'}, without inspecting each one"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def start(self, container_id: str):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def stop(self, container_id: str):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def restart(self, container_id: str):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def pause(self, container_id: str):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def unpause(self, container_id: str):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def remove(self, container_id: str, force: bool = False):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def update_limits(self, container_id: str, cpu_quota: int, cpu_shares: int):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def stats(self, container_id: str, one_shot: bool = False) -> Dict:
+        """One stats snapshot in the Docker API format (cpu_stats, precpu_stats, memory_stats, ...)"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def exec(self, container_id: str, command: List[str]) -> tuple:
+        """Run a command to completion and return (exit_code, output bytes)"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def exec_stream(self, container_id: str, command: List[str]):
+        """Run a command and return an iterator over its raw output chunks"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def logs_stream(self, container_id: str, tail: int):
+        """Iterator over the last `tail` lines of the container's output, without following"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def events(self):
+        """Blocking iterator of container lifecycle events as {'action', 'container_id'}"""
+        raise NotImplementedError
+
+class DockerBackend(RuntimeBackend):
+    """Docker Engine API, also served by rootless Podman's compatibility socket"""
+    
+    def __init__(self, base_url: Optional[str] = None):
+        self.client = docker.DockerClient(base_url=base_url) if base_url else docker.from_env()
+    
+    def image_exists(self, image: str) -> bool:
+        try:
+            self.client.images.get(image)
+            return True
+        except docker.errors.ImageNotFound:
+            return False
+    
+    def pull_image(self, image: str):
+        self.client.images.pull(image)
+    
+    def ensure_volume(self, name: str, labels: Dict[str, str]):
+        try:
+            self.client.volumes.get(name)
+        except docker.errors.NotFound:
+            self.client.volumes.create(name, labels=labels)
+    
+    def list_volumes(self, label: str) -> List[Dict]:
+        return [
+            {'name': volume.name, 'mountpoint': volume.attrs.get('Mountpoint'), 'labels': volume.attrs.get('Labels') or {}}
+            for volume in self.client.volumes.list(filters={'label': label})
+        ]
+    
+    def volume_sizes(self) -> Dict[str, int]:
+        return {
+            volume['Name']: max(0, (volume.get('UsageData') or {}).get('Size', 0))
+            for volume in self.client.df().get('Volumes') or []
+        }
+    
+    def create(self, image: str, volumes: Dict[str, str], mem_limit: str, cpu_quota: int,
+               cpu_shares: int, storage_limit: Optional[str] = None) -> str:
+        options = {}
+        if storage_limit:
+            options['storage_opt'] = {'size': storage_limit}
+        
+        container = self.client.containers.run(
+            image,
+            detach=True,
+            tty=True,
+            mem_limit=mem_limit,
+            cpu_quota=cpu_quota,
+            cpu_shares=cpu_shares,
+            restart_policy={"Name": "on-failure", "MaximumRetryCount": 3},
+            volumes={name: {'bind': path, 'mode': 'rw'} for name, path in volumes.items()},
+            **options
+        )
+        return container.id
+    
+    def status(self, container_id: str) -> str:
+        return self.client.containers.get(container_id).status
+    
+    def list_containers(self, all: bool = False) -> List[Dict]:
+        return [
+            {'id': container.id, 'status': container.status}
+            for container in self.client.containers.list(all=all, sparse=True)
+        ]
+    
+    # Lifecycle calls go through the low-level API, which skips the inspect
+    # round trip that containers.get() makes before every action
+    def start(self, container_id: str):
+        self.client.api.start(container_id)
+    
+    def stop(self, container_id: str):
+        self.client.api.stop(container_id)
+    
+    def restart(self, container_id: str):
+        self.client.api.restart(container_id)
+    
+    def pause(self, container_id: str):
+        self.client.api.pause(container_id)
+    
+    def unpause(self, container_id: str):
+        self.client.api.unpause(container_id)
+    
+    def remove(self, container_id: str, force: bool = False):
+        self.client.api.remove_container(container_id, force=force)
+    
+    def update_limits(self, container_id: str, cpu_quota: int, cpu_shares: int):
+        self.client.api.update_container(container_id, cpu_quota=cpu_quota, cpu_shares=cpu_shares)
+    
+    def stats(self, container_id: str, one_shot: bool = False) -> Dict:
+        # one_shot skips the daemon's second sample, so precpu_stats is empty
+        return self.client.api.stats(container_id, stream=False, one_shot=one_shot or None)
+    
+    def exec(self, container_id: str, command: List[str]) -> tuple:
+        result = self.client.containers.get(container_id).exec_run(command)
+        return result.exit_code, result.output
+    
+    def exec_stream(self, container_id: str, command: List[str]):
+        return self.client.containers.get(container_id).exec_run(command, stream=True).output
+    
+    def logs_stream(self, container_id: str, tail: int):
+        # The daemon applies `tail` by reading the log from the end, so only the requested lines are sent
+        return self.client.api.logs(container_id, stream=True, follow=False, tail=tail)
+    
+    def events(self):
+        for event in self.client.events(decode=True, filters={'type': 'container'}):
+            yield {'action': event.get('Action') or event.get('status'), 'container_id': (event.get('Actor') or {}).get('ID') or event.get('id')}
+
+class SimulatedBackend(RuntimeBackend):
+    """In-memory runtime for tests and benchmarks, no daemon required.
+    
+    Every call blocks for the configured latency like a real daemon would, so
+    load tests exercise the same thread-pool behaviour as production.
+    """
+    
+    LATENCIES = {
+        'create': 0.05, 'pull': 0.05, 'stats': 0.1, 'exec': 0.02, 'list': 0.01,
+        'action': 0.02, 'inspect': 0.002, 'output': 0.0
+    }
+    
+    def __init__(self, latencies: Optional[Dict[str, float]] = None, images=(),
+                 log_lines: int = 500, exec_output_lines: int = 50):
+        self.latencies = {**self.LATENCIES, **(latencies or {})}
+        self.images = set(images)
+        self.log_lines = log_lines
+        self.exec_output_lines = exec_output_lines
+        self.containers: Dict[str, Dict] = {}
+        self.volumes: Dict[str, Dict] = {}
+        self.subscribers = []
+        self.lock = threading.Lock()
+    
+    def wait(self, kind: str):
+        if self.latencies[kind]:
+            time.sleep(self.latencies[kind])
+    
+    def get(self, container_id: str) -> Dict:
+        with self.lock:
+            container = self.containers.get(container_id)
+        if container is None:
+            raise docker.errors.NotFound(f"No such container: {container_id}")
+        return container
+    
+    def publish(self, action: str, container_id: str):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.put({'action': action, 'container_id': container_id})
+    
+    def set_status(self, container_id: str, status: str, action: str):
+        self.wait('action')
+        self.get(container_id)['status'] = status
+        self.publish(action, container_id)
+    
+    def image_exists(self, image: str) -> bool:
+        return image in self.images
+    
+    def pull_image(self, image: str):
+        self.wait('pull')
+        self.images.add(image)
+    
+    def ensure_volume(self, name: str, labels: Dict[str, str]):
+        with self.lock:
+            self.volumes.setdefault(name, {'name': name, 'mountpoint': None, 'labels': dict(labels)})
+    
+    def list_volumes(self, label: str) -> List[Dict]:
+        self.wait('list')
+        with self.lock:
+            return [dict(volume) for volume in self.volumes.values() if label in volume['labels']]
+    
+    def volume_sizes(self) -> Dict[str, int]:
+        with self.lock:
+            return {name: 0 for name in self.volumes}
+    
+    def create(self, image: str, volumes: Dict[str, str], mem_limit: str, cpu_quota: int,
+               cpu_shares: int, storage_limit: Optional[str] = None) -> str:
+        self.wait('create')
+        if image not in self.images:
+            raise docker.errors.ImageNotFound(f"No such image: {image}")
+        container_id = os.urandom(32).hex()
+        with self.lock:
+            for name in volumes:
+                if name not in self.volumes:
+                    raise docker.errors.NotFound(f"No such volume: {name}")
+            self.containers[container_id] = {
+                'id': container_id, 'image': image, 'status': 'running', 'volumes': dict(volumes),
+                'cpu_quota': cpu_quota, 'cpu_shares': cpu_shares, 'cpu_usage': 0, 'system_usage': 0
+            }
+        self.publish('create', container_id)
+        self.publish('start', container_id)
+        return container_id
+    
+    def status(self, container_id: str) -> str:
+        self.wait('inspect')
+        return self.get(container_id)['status']
+    
+    def list_containers(self, all: bool = False) -> List[Dict]:
+        self.wait('list')
+        with self.lock:
+            containers = [{'id': c['id'], 'status': c['status']} for c in self.containers.values()]
+        return containers if all else [c for c in containers if c['status'] == 'running']
+    
+    def start(self, container_id: str):
+        self.set_status(container_id, 'running', 'start')
+    
+    def stop(self, container_id: str):
+        self.set_status(container_id, 'exited', 'die')
+    
+    def restart(self, container_id: str):
+        self.set_status(container_id, 'running', 'restart')
+    
+    def pause(self, container_id: str):
+        self.set_status(container_id, 'paused', 'pause')
+    
+    def unpause(self, container_id: str):
+        self.set_status(container_id, 'running', 'unpause')
+    
+    def remove(self, container_id: str, force: bool = False):
+        self.wait('action')
+        container = self.get(container_id)
+        if container['status'] == 'running' and not force:
+            raise docker.errors.APIError(f"Container {container_id} is running, stop it or use force")
+        with self.lock:
+            self.containers.pop(container_id, None)
+        self.publish('destroy', container_id)
+    
+    def update_limits(self, container_id: str, cpu_quota: int, cpu_shares: int):
+        self.wait('action')
+        self.get(container_id).update(cpu_quota=cpu_quota, cpu_shares=cpu_shares)
+    
+    def stats(self, container_id: str, one_shot: bool = False) -> Dict:
+        self.wait('stats')
+        container = self.get(container_id)
+        with self.lock:
+            previous = (container['cpu_usage'], container['system_usage'])
+            # A running container uses 5% of the host between polls
+            container['system_usage'] += 1_000_000_000
+            if container['status'] == 'running':
+                container['cpu_usage'] += 50_000_000
+            current = (container['cpu_usage'], container['system_usage'])
+        return {
+            'cpu_stats': {'cpu_usage': {'total_usage': current[0]}, 'system_cpu_usage': current[1], 'online_cpus': 2},
+            'precpu_stats': {} if one_shot else {'cpu_usage': {'total_usage': previous[0]}, 'system_cpu_usage': previous[1]},
+            'memory_stats': {'usage': 256 * 1024 ** 2, 'limit': 6 * 1024 ** 3},
+            'pids_stats': {'current': 12},
+            'networks': {'eth0': {'rx_bytes': 0, 'tx_bytes': 0}}
+        }
+    
+    def exec(self, container_id: str, command: List[str]) -> tuple:
+        self.wait('exec')
+        if self.get(container_id)['status'] != 'running':
+            raise docker.errors.APIError(f"Container {container_id} is not running")
+        if "display" in command:
+            return 0, f"ssh {container_id[:20]}@sim.tmate.io\n".encode()
+        return 0, b""
+    
+    def exec_stream(self, container_id: str, command: List[str]):
+        self.exec(container_id, command)
+        return self.output_lines(container_id, self.exec_output_lines)
+    
+    def logs_stream(self, container_id: str, tail: int):
+        self.get(container_id)
+        return self.output_lines(container_id, min(tail, self.log_lines))
+    
+    def output_lines(self, container_id: str, count: int):
+        for line in range(count):
+            self.wait('output')
+            yield f"{container_id[:12]} line {line}\n".encode()
+    
+    def events(self):
+        subscriber = queue.Queue()
+        with self.lock:
+            self.subscribers.append(subscriber)
+        try:
+            while True:
+                yield subscriber.get()
+        finally:
+            with self.lock:
+                self.subscribers.remove(subscriber)
+
+def create_runtime() -> RuntimeBackend:
+    if RUNTIME_BACKEND == 'simulated':
+        return SimulatedBackend(images=[image['name'] for image in DOCKER_IMAGES.values()])
+    if RUNTIME_BACKEND == 'docker':
+        return DockerBackend(DOCKER_BASE_URL)
+    raise ValueError(f"Unknown RUNTIME_BACKEND {RUNTIME_BACKEND!r}")
+
+# Container helper functions
+TMATE_SOCKET = '/tmp/tmate.sock'
+TMATE_READY_TIMEOUT = 30  # Seconds to wait for the tmate server before giving up
+
+def calculate_cpu_percent(cpu_stats: Dict, precpu_stats: Dict) -> float:
+    try:
+        cpu_delta = cpu_stats['cpu_usage']['total_usage'] - precpu_stats['cpu_usage']['total_usage']
+        system_delta = cpu_stats['system_cpu_usage'] - precpu_stats['system_cpu_usage']
+    except KeyError:
+        return 0.0
+    
+    if system_delta > 0 and cpu_delta > 0:
+        online_cpus = cpu_stats.get('online_cpus') or len(cpu_stats['cpu_usage'].get('percpu_usage') or [1])
+        return (cpu_delta / system_delta) * online_cpus * 100
+    return 0.0
+
+def get_container_stats(container_id: str) -> Dict:
+    try:
+        status = runtime.status(container_id)
+        stats = runtime.stats(container_id)
+        
+        cpu_percent = 0.0
+        memory_usage = 0
+        memory_limit = 0
+        
+        if 'cpu_stats' in stats and 'precpu_stats' in stats:
+            cpu_percent = calculate_cpu_percent(stats['cpu_stats'], stats['precpu_stats'])
+        
+        if 'memory_stats' in stats:
+            memory_usage = stats['memory_stats'].get('usage', 0)
+            memory_limit = stats['memory_stats'].get('limit', 1)
+        
+        if usage_store is not None:
+            usage_store.record(
+                container_id, time.time(), cpu_percent,
+                (memory_usage / memory_limit) * 100 if memory_limit else 0
+            )
+        
+        return {
+            'cpu_percent': round(cpu_percent, 2),
+            'memory_usage': memory_usage,
+            'memory_limit': memory_limit,
+            'memory_percent': round((memory_usage / memory_limit) * 100, 2) if memory_limit else 0,
+            'online': status == 'running'
+        }
+    except Exception as e:
+        logger.error(f"Error getting stats for container {container_id}: {e}")
+        return None
+
+def image_exists(image: str) -> bool:
+    return runtime.image_exists(image)
+
+def pull_image(image: str):
+    runtime.pull_image(image)
+
+def user_volume_name(user_id: str) -> str:
+    return f"vps-data-{user_id}"
+
+def ensure_user_volume(user_id: str) -> str:
+    name = user_volume_name(user_id)
+    runtime.ensure_volume(name, {VOLUME_LABEL: user_id})
+    return name
+
+def run_container(image: str, user_id: str) -> str:
+    return runtime.create(
+        image,
+        volumes={ensure_user_volume(user_id): VOLUME_MOUNT_PATH},
+        mem_limit='6g',  # 6GB memory limit
+        cpu_quota=CONTAINER_CPU_QUOTA,  # Limit CPU usage
+        cpu_shares=CONTAINER_CPU_SHARES,  # CPU priority
+        storage_limit=CONTAINER_STORAGE_LIMIT
+    )
+
+def get_container_status(container_id: str) -> str:
+    return runtime.status(container_id)
+
+def generate_ssh_session(container_id: str) -> Optional[str]:
+    """Start a detached tmate session in the container and return its SSH command"""
+    # Replace any previous session so regenerating always yields fresh credentials
+    runtime.exec(container_id, ["tmate", "-S", TMATE_SOCKET, "kill-server"])
+    runtime.exec(container_id, ["tmate", "-S", TMATE_SOCKET, "new-session", "-d"])
+    # exec blocks a pool thread until the command exits, so an unreachable tmate server must not hang it
+    exit_code, _ = runtime.exec(
+        container_id, ["timeout", "-s", "KILL", str(TMATE_READY_TIMEOUT), "tmate", "-S", TMATE_SOCKET, "wait", "tmate-ready"]
+    )
+    if exit_code != 0:
+        runtime.exec(container_id, ["tmate", "-S", TMATE_SOCKET, "kill-server"])
+        return None
+    exit_code, output = runtime.exec(container_id, ["tmate", "-S", TMATE_SOCKET, "display", "-p", "#{tmate_ssh}"])
+    
+    if exit_code != 0:
+        return None
+    return output.decode('utf-8').strip() or None
+
+def container_action(container_id: str, action: str):
+    """Apply a lifecycle action to a container and record it in the database"""
+    if action == "start":
+        if runtime.status(container_id) == 'paused':
+            runtime.unpause(container_id)
+            abuse_detector.restore(container_id)
+        else:
+            runtime.start(container_id)
+        update_container_status(container_id, "running")
+    elif action == "stop":
+        runtime.stop(container_id)
+        update_container_status(container_id, "stopped")
+    elif action == "restart":
+        runtime.restart(container_id)
+        update_container_status(container_id, "running")
+    elif action == "remove":
+        runtime.stop(container_id)
+        runtime.remove(container_id)
+        remove_from_database(container_id)
+        abuse_detector.forget(container_id)
+        if usage_store is not None:
+            usage_store.release(container_id)
+    else:
+        raise ValueError("Invalid action")
+
+def capped_output(chunks, cancelled: threading.Event):
+    """Decode raw output chunks into text, stopping at STREAM_MAX_BYTES or STREAM_MAX_SECONDS"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    deadline = time.time() + STREAM_MAX_SECONDS
+    total = 0
+    
+    try:
+        for chunk in chunks:
+            if total + len(chunk) > STREAM_MAX_BYTES:
+                yield decoder.decode(chunk[:STREAM_MAX_BYTES - total], final=True)
+                yield f"\n[output truncated at {STREAM_MAX_BYTES // 1024}KB]"
+                return
+            total += len(chunk)
+            
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+            if cancelled.is_set():
+                return
+            if time.time() > deadline:
+                yield f"\n[stopped after {STREAM_MAX_SECONDS}s]"
+                return
+        yield decoder.decode(b"", final=True)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+def stream_logs(cancelled: threading.Event, container_id: str, lines: int):
+    yield from capped_output(runtime.logs_stream(container_id, lines), cancelled)
+
+def stream_exec(cancelled: threading.Event, container_id: str, command: str):
+    # A blocked read can't check the deadline, so the command is also killed inside the container
+    output = runtime.exec_stream(
+        container_id, ["timeout", "-s", "KILL", str(STREAM_MAX_SECONDS), "sh", "-c", command]
+    )
+    yield from capped_output(output, cancelled)
+
+async def execute_command(command: str) -> tuple:
+    process = await asyncio.create_subprocess_shell(
+        command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    return stdout.decode(), stderr.decode()
+
+# Host statistics
+HostSample = collections.namedtuple('HostSample', [
+    'timestamp', 'cpu_percent', 'memory_percent', 'memory_used', 'memory_total',
+    'disk_percent', 'disk_used', 'disk_total', 'disk_read_rate', 'disk_write_rate',
+    'net_sent_rate', 'net_recv_rate'
+])
+
+class HostSampler:
+    """Samples host CPU, memory, disk and I/O in the background into a fixed-size ring buffer"""
+    
+    def __init__(self, interval: float, history_seconds: int):
+        self.interval = interval
+        self.samples = collections.deque(maxlen=int(history_seconds / interval))
+        self.lock = threading.Lock()
+        self.thread = None
+        self.last_io = None
+        self.container_counts = (0, 0)
+        self.counts_updated = 0.0
+    
+    def start(self):
+        if self.thread is None:
+            psutil.cpu_percent()  # Prime the counter so the first sample covers one interval
+            self.thread = threading.Thread(target=self.run, name="host-sampler", daemon=True)
+            self.thread.start()
+            if runtime is not None:
+                threading.Thread(target=self.watch_events, name="runtime-events", daemon=True).start()
+    
+    def watch_events(self):
+        """Refresh container counts on the next sample after any lifecycle change instead of polling"""
+        while True:
+            try:
+                for event in runtime.events():
+                    if event['action'] in CONTAINER_COUNT_EVENTS:
+                        self.counts_updated = 0.0
+            except Exception as e:
+                logger.error(f"Error watching runtime events: {e}")
+            time.sleep(self.interval)
+    
+    def run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Error sampling host statistics: {e}")
+            time.sleep(self.interval)
+    
+    def sample(self):
+        now = time.time()
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        disk_io = psutil.disk_io_counters()
+        net_io = psutil.net_io_counters()
+        io = (
+            now,
+            disk_io.read_bytes if disk_io else 0,
+            disk_io.write_bytes if disk_io else 0,
+            net_io.bytes_sent if net_io else 0,
+            net_io.bytes_recv if net_io else 0
+        )
+        
+        rates = [0.0, 0.0, 0.0, 0.0]
+        if self.last_io and now > self.last_io[0]:
+            elapsed = now - self.last_io[0]
+            rates = [max(0, current - previous) / elapsed for current, previous in zip(io[1:], self.last_io[1:])]
+        self.last_io = io
+        
+        if runtime is not None and now - self.counts_updated >= CONTAINER_COUNT_INTERVAL:
+            self.refresh_container_counts()
+        
+        with self.lock:
+            self.samples.append(HostSample(
+                now, psutil.cpu_percent(), memory.percent, memory.used, memory.total,
+                disk.percent, disk.used, disk.total, *rates
+            ))
+    
+    def refresh_container_counts(self):
+        # One list call gives both counts without inspecting every container
+        containers = runtime.list_containers(all=True)
+        running = sum(1 for container in containers if container['status'] == 'running')
+        self.container_counts = (running, len(containers))
+        self.counts_updated = time.time()
+    
+    def summary(self) -> Dict:
+        with self.lock:
+            samples = list(self.samples)
+        if not samples:
+            self.sample()
+            with self.lock:
+                samples = list(self.samples)
+        
+        latest = samples[-1]
+        
+        def average(field: str, minutes: int) -> float:
+            values = [getattr(s, field) for s in samples if s.timestamp >= latest.timestamp - minutes * 60]
+            return round(sum(values) / len(values), 1)
+        
+        def history(field: str) -> List[float]:
+            return downsample([getattr(s, field) for s in samples], SPARKLINE_POINTS)
+        
+        running, total = self.container_counts
+        return {
+            **latest._asdict(),
+            'cpu_averages': [average('cpu_percent', minutes) for minutes in (1, 5, 15)],
+            'memory_averages': [average('memory_percent', minutes) for minutes in (1, 5, 15)],
+            'disk_averages': [average('disk_percent', minutes) for minutes in (1, 5, 15)],
+            'cpu_history': history('cpu_percent'),
+            'memory_history': history('memory_percent'),
+            'disk_history': history('disk_percent'),
+            'running_containers': running,
+            'total_containers': total
+        }
+
+host_sampler = HostSampler(HOST_SAMPLE_INTERVAL, HOST_HISTORY_SECONDS)
+
+def get_host_stats() -> Dict:
+    return host_sampler.summary()
+
+def downsample(values: List[float], points: int) -> List[float]:
+    """Average consecutive values into at most `points` buckets"""
+    size = max(1, -(-len(values) // points))
+    return [sum(values[i:i + size]) / len(values[i:i + size]) for i in range(0, len(values), size)]
+
+def sparkline(values: List[float], maximum: float = 100) -> str:
+    blocks = "▁▂▃▄▅▆▇█"
+    return "".join(blocks[min(len(blocks) - 1, int(value / maximum * len(blocks)))] for value in values)
+
+def format_rate(rate: float) -> str:
+    return f"{format_bytes(rate)}/s"
+
+# Resource usage history
+class UsageTier:
+    """One resolution of the usage store: a ring of time buckets, each a row of per-container sums"""
+    
+    columns = ('cpu_sum', 'memory_sum', 'cpu_max', 'count')
+    
+    def __init__(self, buffer: memoryview, offset: int, resolution: int, rows: int, slots: int):
+        self.resolution = resolution
+        self.rows = rows
+        self.slots = slots
+        
+        # Row timestamps (bucket numbers) followed by one float32 column per metric,
+        # laid out row-major so each bucket is a contiguous run over all containers
+        self.bucket = buffer[offset:offset + rows * 4].cast('I')
+        offset += rows * 4
+        for column in self.columns:
+            setattr(self, column, buffer[offset:offset + rows * slots * 4].cast('f'))
+            offset += rows * slots * 4
+        self.end = offset
+        self.empty_row = memoryview(array.array('f', bytes(slots * 4)))
+    
+    @staticmethod
+    def size(rows: int, slots: int) -> int:
+        return rows * 4 + len(UsageTier.columns) * rows * slots * 4
+    
+    def add(self, slot: int, timestamp: float, cpu: float, memory: float):
+        bucket = int(timestamp // self.resolution)
+        row = bucket % self.rows
+        
+        # Reaching a bucket again after a full lap drops whatever it held, which enforces retention
+        if self.bucket[row] != bucket:
+            for column in self.columns:
+                getattr(self, column)[row * self.slots:(row + 1) * self.slots] = self.empty_row
+            self.bucket[row] = bucket
+        
+        index = row * self.slots + slot
+        self.cpu_sum[index] += cpu
+        self.memory_sum[index] += memory
+        self.cpu_max[index] = max(self.cpu_max[index], cpu)
+        self.count[index] += 1
+    
+    def clear_slot(self, slot: int):
+        for column in self.columns:
+            values = getattr(self, column)
+            for row in range(self.rows):
+                values[row * self.slots + slot] = 0
+    
+    def live_rows(self, since: float, until: float) -> List[int]:
+        return self.rows_between(int(since // self.resolution), int(until // self.resolution))
+    
+    def rows_between(self, first: int, last: int) -> List[int]:
+        return [row for row in range(self.rows) if first <= self.bucket[row] <= last]
+    
+    def window_buckets(self, window: float, now: float) -> tuple:
+        """First and last bucket of the latest `window` seconds in whole buckets, counting the current one"""
+        last = int(now // self.resolution)
+        return last - max(1, int(-(-window // self.resolution))) + 1, last
+
+class UsageStore:
+    """Per-container CPU and memory history in a memory-mapped file, rolled up by minute and hour"""
+    
+    magic = b'USAGE001'
+    
+    def __init__(self, path: str, index_path: str, slots: int, minute_rows: int, hour_rows: int):
+        self.index_path = index_path
+        self.slots = slots
+        self.lock = threading.Lock()
+        
+        size = len(self.magic) + UsageTier.size(minute_rows, slots) + UsageTier.size(hour_rows, slots)
+        if not os.path.exists(path):
+            open(path, 'wb').close()
+        
+        with open(path, 'r+b') as f:
+            fresh = f.read(len(self.magic)) != self.magic or os.path.getsize(path) != size
+            if fresh:
+                # New file or a different layout: start over with an all-zero (sparse) file
+                f.truncate(0)
+                f.truncate(size)
+                f.seek(0)
+                f.write(self.magic)
+                f.flush()
+            self.mmap = mmap.mmap(f.fileno(), size)
+        
+        buffer = memoryview(self.mmap)
+        self.minutes = UsageTier(buffer, len(self.magic), 60, minute_rows, slots)
+        self.hours = UsageTier(buffer, self.minutes.end, 3600, hour_rows, slots)
+        
+        self.container_slots: Dict[str, int] = {}
+        if not fresh and os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                try:
+                    self.container_slots = json.load(f)
+                except json.JSONDecodeError:
+                    # Slots are cleared when reassigned, so losing the index only loses history
+                    logger.warning(f"Usage index {index_path} is corrupt, starting with an empty index")
+        self.slot_containers = {slot: container_id for container_id, slot in self.container_slots.items()}
+    
+    def save_index(self):
+        # Replaced atomically like database.json, so a crash never leaves a truncated index
+        temp_file = f"{self.index_path}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(self.container_slots, f)
+        os.replace(temp_file, self.index_path)
+    
+    def slot_for(self, container_id: str) -> Optional[int]:
+        slot = self.container_slots.get(container_id)
+        if slot is not None:
+            return slot
+        
+        free = next((s for s in range(self.slots) if s not in self.slot_containers), None)
+        if free is None:
+            logger.warning(f"Usage store is full, not recording {container_id[:12]}")
+            return None
+        
+        self.minutes.clear_slot(free)
+        self.hours.clear_slot(free)
+        self.container_slots[container_id] = free
+        self.slot_containers[free] = container_id
+        self.save_index()
+        return free
+    
+    def record(self, container_id: str, timestamp: float, cpu: float, memory: float):
+        with self.lock:
+            slot = self.slot_for(container_id)
+            if slot is None:
+                return
+            self.minutes.add(slot, timestamp, cpu, memory)
+            self.hours.add(slot, timestamp, cpu, memory)
+    
+    def release(self, container_id: str):
+        with self.lock:
+            slot = self.container_slots.pop(container_id, None)
+            if slot is not None:
+                del self.slot_containers[slot]
+                self.save_index()
+    
+    def release_missing(self, existing: set):
+        with self.lock:
+            missing = set(self.container_slots) - existing
+            for container_id in missing:
+                del self.slot_containers[self.container_slots.pop(container_id)]
+            if missing:
+                self.save_index()
+    
+    def tier_for(self, window: float) -> UsageTier:
+        """Tier answering averages() and summary(), so /info and /admin-top agree for the same window.
+
+        Scanning every container only stays cheap over a few dozen rows, so anything
+        an hour or longer is answered from the hourly rollups, in whole hours.
+        """
+        return self.minutes if window < 3600 else self.hours
+    
+    def averages(self, window: float, now: Optional[float] = None) -> Dict[str, Dict]:
+        """Average and peak CPU and memory of every recorded container over the last `window` seconds"""
+        now = now or time.time()
+        tier = self.tier_for(window)
+        first, last = tier.window_buckets(window, now)
+        cpu = [0.0] * self.slots
+        memory = [0.0] * self.slots
+        counts = [0.0] * self.slots
+        peaks = [0.0] * self.slots
+        
+        # The lock is held for one row at a time, so long windows never stall the collector
+        for row in range(tier.rows):
+            with self.lock:
+                if not first <= tier.bucket[row] <= last:
+                    continue
+                start, end = row * self.slots, (row + 1) * self.slots
+                cpu = list(map(operator.add, cpu, tier.cpu_sum[start:end]))
+                memory = list(map(operator.add, memory, tier.memory_sum[start:end]))
+                counts = list(map(operator.add, counts, tier.count[start:end]))
+                peaks = list(map(max, peaks, tier.cpu_max[start:end]))
+        
+        with self.lock:
+            containers = dict(self.slot_containers)
+        
+        return {
+            container_id: {
+                'cpu_avg': round(cpu[slot] / counts[slot], 2),
+                'cpu_max': round(peaks[slot], 2),
+                'memory_avg': round(memory[slot] / counts[slot], 2)
+            }
+            for slot, container_id in containers.items() if counts[slot]
+        }
+    
+    def summary(self, container_id: str, window: float, now: Optional[float] = None) -> Optional[Dict]:
+        """Like averages() for a single container, reading only its own cell of each row"""
+        now = now or time.time()
+        tier = self.tier_for(window)
+        cpu = memory = count = peak = 0.0
+        
+        with self.lock:
+            slot = self.container_slots.get(container_id)
+            if slot is None:
+                return None
+            for row in tier.rows_between(*tier.window_buckets(window, now)):
+                index = row * self.slots + slot
+                cpu += tier.cpu_sum[index]
+                memory += tier.memory_sum[index]
+                count += tier.count[index]
+                peak = max(peak, tier.cpu_max[index])
+        
+        if not count:
+            return None
+        return {'cpu_avg': round(cpu / count, 2), 'cpu_max': round(peak, 2), 'memory_avg': round(memory / count, 2)}
+    
+    def top(self, metric: str, window: float, limit: int) -> List[Dict]:
+        averages = self.averages(window)
+        ranked = heapq.nlargest(limit, averages.items(), key=lambda item: item[1][metric])
+        return [{'container_id': container_id, **values} for container_id, values in ranked]
+    
+    def history(self, container_id: str, window: float, now: Optional[float] = None) -> List[Dict]:
+        now = now or time.time()
+        tier = self.minutes if window <= self.minutes.rows * 60 else self.hours
+        
+        with self.lock:
+            slot = self.container_slots.get(container_id)
+            if slot is None:
+                return []
+            points = []
+            for row in tier.live_rows(now - window, now):
+                index = row * self.slots + slot
+                if tier.count[index]:
+                    points.append({
+                        'timestamp': tier.bucket[row] * tier.resolution,
+                        'cpu_avg': tier.cpu_sum[index] / tier.count[index],
+                        'memory_avg': tier.memory_sum[index] / tier.count[index]
+                    })
+        return sorted(points, key=lambda point: point['timestamp'])
+
+usage_store = None  # Opened by the process that owns orchestration
+
+def open_usage_store():
+    global usage_store
+    usage_store = UsageStore(
+        USAGE_FILE, USAGE_INDEX_FILE, USAGE_MAX_CONTAINERS,
+        USAGE_MINUTE_RETENTION // 60, USAGE_HOUR_RETENTION // 3600
+    )
+
+class UsageCollector:
+    """Polls one-shot stats of every running container and records them in the usage store"""
+    
+    def __init__(self, interval: float, threads: int):
+        self.interval = interval
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+        self.previous: Dict[str, Dict] = {}
+        self.thread = None
+    
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="usage-collector", daemon=True)
+            self.thread.start()
+    
+    def run(self):
+        while True:
+            started = time.time()
+            try:
+                self.collect()
+            except Exception as e:
+                logger.error(f"Error collecting container usage: {e}")
+            time.sleep(max(0, self.interval - (time.time() - started)))
+    
+    def collect(self):
+        # Other containers on the host (including the bot's own) are never measured, throttled or reset
+        managed = managed_container_ids()
+        listed = runtime.list_containers(all=True)
+        containers = [container for container in listed if container['id'] in managed]
+        running = [container['id'] for container in containers if container['status'] == 'running']
+        samples = self.pool.map(self.sample, running)
+        
+        seen = set()
+        for container_id, sample in samples:
+            seen.add(container_id)
+            if sample is not None:
+                usage_store.record(container_id, sample['timestamp'], sample['cpu_percent'], sample['memory_percent'])
+                abuse_detector.observe(container_id, sample)
+        
+        for container_id in set(self.previous) - seen:
+            del self.previous[container_id]
+        # Stopped and paused containers keep their state, so limits are still lifted after a restart
+        abuse_detector.forget_missing({container['id'] for container in containers})
+        # Slots of containers removed outside the bot would otherwise be held forever
+        usage_store.release_missing({container['id'] for container in listed})
+    
+    def sample(self, container_id: str) -> tuple:
+        """Return (container_id, sample); CPU is measured against this container's previous poll"""
+        try:
+            stats = runtime.stats(container_id, one_shot=True)
+        except Exception as e:
+            logger.debug(f"Could not read stats for {container_id[:12]}: {e}")
+            return container_id, None
+        
+        now = time.time()
+        previous = self.previous.get(container_id)
+        self.previous[container_id] = (now, stats)
+        if previous is None:
+            abuse_detector.reset_untracked(container_id)
+            return container_id, None
+        
+        previous_time, previous_stats = previous
+        memory = stats.get('memory_stats', {})
+        memory_limit = memory.get('limit') or 0
+        egress = network_tx_bytes(stats) - network_tx_bytes(previous_stats)
+        return container_id, {
+            'timestamp': now,
+            'cpu_percent': calculate_cpu_percent(stats.get('cpu_stats', {}), previous_stats.get('cpu_stats', {})),
+            'memory_percent': (memory.get('usage', 0) / memory_limit) * 100 if memory_limit else 0,
+            'pids': (stats.get('pids_stats') or {}).get('current', 0),
+            'egress_rate': max(0, egress) / (now - previous_time) if now > previous_time else 0.0
+        }
+
+def network_tx_bytes(stats: Dict) -> int:
+    return sum(network.get('tx_bytes', 0) for network in (stats.get('networks') or {}).values())
+
+usage_collector = UsageCollector(USAGE_SAMPLE_INTERVAL, USAGE_COLLECTOR_THREADS)
+
+# Abuse detection
+class AbuseDetector:
+    """Flags runaway containers from usage samples, throttles them and then pauses them"""
+    
+    NORMAL, THROTTLED, SUSPENDED = 0, 1, 2
+    
+    def __init__(self):
+        self.state: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+    
+    def observe(self, container_id: str, sample: Dict):
+        with self.lock:
+            state = self.state.setdefault(container_id, {
+                'level': self.NORMAL, 'cpu_strikes': 0, 'egress': 0.0, 'strikes': 0, 'clean': 0
+            })
+        
+        # Saturation is judged against the current quota, so a throttled miner still counts
+        quota = ABUSE_THROTTLED_CPU_QUOTA if state['level'] == self.THROTTLED else CONTAINER_CPU_QUOTA
+        saturated = sample['cpu_percent'] >= quota / 1000 * ABUSE_CPU_SATURATION
+        state['cpu_strikes'] = state['cpu_strikes'] + 1 if saturated else 0
+        state['egress'] += ABUSE_EGRESS_SMOOTHING * (sample['egress_rate'] - state['egress'])
+        
+        reasons = []
+        if state['cpu_strikes'] >= ABUSE_CPU_SAMPLES:
+            reasons.append(f"CPU at {sample['cpu_percent']:.0f}% for over {ABUSE_CPU_SAMPLES * USAGE_SAMPLE_INTERVAL // 60} minutes")
+        if sample['pids'] >= ABUSE_PIDS_LIMIT:
+            reasons.append(f"{sample['pids']} processes running (possible fork bomb)")
+        if state['egress'] >= ABUSE_EGRESS_RATE:
+            reasons.append(f"Sustained network egress of {format_rate(state['egress'])}")
+        
+        try:
+            if reasons:
+                state['clean'] = 0
+                self.escalate(container_id, state, reasons)
+            elif state['level'] == self.THROTTLED:
+                state['clean'] += 1
+                if state['clean'] >= ABUSE_RECOVERY_SAMPLES:
+                    self.restore(container_id)
+                    notify_container_owner(
+                        container_id, "Instance Throttling Lifted",
+                        f"Instance `{container_id[:12]}` is back to normal usage and its CPU limits were restored.",
+                        0x00ff00
+                    )
+        except docker.errors.DockerException as e:
+            logger.error(f"Error applying abuse response to {container_id[:12]}: {e}")
+    
+    def escalate(self, container_id: str, state: Dict, reasons: List[str]):
+        details = "\n".join(f"• {reason}" for reason in reasons)
+        
+        if state['level'] == self.NORMAL:
+            runtime.update_limits(container_id, cpu_quota=ABUSE_THROTTLED_CPU_QUOTA, cpu_shares=ABUSE_THROTTLED_CPU_SHARES)
+            state['level'] = self.THROTTLED
+            state['strikes'] = 0
+            logger.warning(f"Throttled container {container_id[:12]}: {'; '.join(reasons)}")
+            notify_container_owner(
+                container_id, "⚠️ Instance Throttled",
+                f"Instance `{container_id[:12]}` has had its CPU limited:\n{details}\n\n"
+                "It will be paused if this continues.",
+                0xffa500
+            )
+        elif state['level'] == self.THROTTLED:
+            state['strikes'] += 1
+            if state['strikes'] >= ABUSE_ESCALATE_SAMPLES:
+                runtime.pause(container_id)
+                update_container_status(container_id, "suspended")
+                state['level'] = self.SUSPENDED
+                logger.warning(f"Paused container {container_id[:12]}: {'; '.join(reasons)}")
+                notify_container_owner(
+                    container_id, "⛔ Instance Suspended",
+                    f"Instance `{container_id[:12]}` was paused after throttling did not help:\n{details}\n\n"
+                    "Contact an admin to have it resumed.",
+                    0xff0000
+                )
+    
+    def restore(self, container_id: str):
+        """Lift any throttling or suspension, e.g. when an admin resumes the instance"""
+        runtime.update_limits(container_id, cpu_quota=CONTAINER_CPU_QUOTA, cpu_shares=CONTAINER_CPU_SHARES)
+        with self.lock:
+            self.state.pop(container_id, None)
+    
+    def reset_untracked(self, container_id: str):
+        """Give a container with no detector state normal limits, e.g. one throttled before the bot restarted"""
+        with self.lock:
+            if container_id in self.state:
+                return
+        try:
+            runtime.update_limits(container_id, cpu_quota=CONTAINER_CPU_QUOTA, cpu_shares=CONTAINER_CPU_SHARES)
+        except docker.errors.DockerException as e:
+            logger.error(f"Error resetting limits of {container_id[:12]}: {e}")
+    
+    def forget(self, container_id: str):
+        with self.lock:
+            self.state.pop(container_id, None)
+    
+    def forget_missing(self, existing: set):
+        with self.lock:
+            for container_id in set(self.state) - existing:
+                del self.state[container_id]
+
+abuse_detector = AbuseDetector()
+
+# Notifications
+# Queued by background workers in the orchestrating process and delivered as DMs
+# by whichever bot process drains the queue next.
+notifications = collections.deque(maxlen=1000)
+
+def notify(user_ids: List[int], title: str, description: str, color: int):
+    notifications.append({
+        'user_ids': list(dict.fromkeys(user_ids)),
+        'title': title,
+        'description': description,
+        'color': color
+    })
+
+def notify_container_owner(container_id: str, title: str, description: str, color: int):
+    container_info = get_container_info(container_id)
+    owner = [int(container_info['user_id'])] if container_info else []
+    notify(owner + ADMIN_IDS, title, description, color)
+
+def drain_notifications() -> List[Dict]:
+    drained = []
+    while notifications:
+        drained.append(notifications.popleft())
+    return drained
+
+def get_usage_summary(container_id: str) -> Optional[Dict]:
+    if usage_store is None:
+        return None
+    
+    hour = usage_store.history(container_id, 3600)
+    day = usage_store.summary(container_id, 86400)
+    if not hour and not day:
+        return None
+    return {
+        'hour_cpu': downsample([point['cpu_avg'] for point in hour], SPARKLINE_POINTS),
+        'hour_cpu_avg': round(sum(point['cpu_avg'] for point in hour) / len(hour), 2) if hour else None,
+        'day': day
+    }
+
+def get_top_consumers(metric: str, window: float, limit: int) -> List[Dict]:
+    if usage_store is None:
+        return []
+    return usage_store.top(metric, window, limit)
+
+# Instance expiry
+class ExpiryScheduler:
+    """Min-heap of upcoming expiry warnings and expiries, applied by a periodic batched sweep.
+
+    The sweep also drops orphans, i.e. records whose container was removed
+    outside the bot. It makes one runtime list call and at most two database
+    writes per run: one for warnings and orphans, one for instances whose
+    container was actually removed.
+    """
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.heap = []
+        self.lock = threading.Lock()
+        self.thread = None
+    
+    def schedule(self, container_id: str, expires_at: float):
+        with self.lock:
+            heapq.heappush(self.heap, (expires_at - EXPIRY_WARNING, "warn", container_id))
+            heapq.heappush(self.heap, (expires_at, "expire", container_id))
+    
+    def load(self):
+        """Rebuild the heap from the database, giving records from before TTLs existed a full TTL"""
+        now = datetime.datetime.now()
+        entries = []
+        
+        with database_lock:
+            data = load_database()
+            changed = False
+            for user_id, containers in data.items():
+                for container in containers:
+                    if "expires_at" not in container:
+                        ttl = instance_ttl(user_id, container['image'])
+                        container["expires_at"] = (now + ttl).isoformat() if ttl else None
+                        changed = True
+                    if container["expires_at"]:
+                        expires_at = datetime.datetime.fromisoformat(container["expires_at"]).timestamp()
+                        if not container.get("expiry_warned"):
+                            entries.append((expires_at - EXPIRY_WARNING, "warn", container["container_id"]))
+                        entries.append((expires_at, "expire", container["container_id"]))
+            if changed:
+                save_database(data)
+        
+        with self.lock:
+            self.heap = entries
+            heapq.heapify(self.heap)
+    
+    def start(self):
+        if self.thread is None:
+            self.load()
+            self.thread = threading.Thread(target=self.run, name="expiry-sweeper", daemon=True)
+            self.thread.start()
+    
+    def run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Error sweeping instances: {e}")
+            time.sleep(self.interval)
+    
+    def pop_due(self, now: float) -> List[tuple]:
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                due.append(heapq.heappop(self.heap))
+        return due
+    
+    def requeue(self, entries: List[tuple]):
+        with self.lock:
+            for entry in entries:
+                heapq.heappush(self.heap, entry)
+    
+    def sweep(self):
+        now = time.time()
+        due = self.pop_due(now)
+        try:
+            self.apply(now, due)
+        except Exception:
+            # Nothing was decided, so the next sweep retries the same entries
+            self.requeue(due)
+            raise
+    
+    def apply(self, now: float, due: List[tuple]):
+        warn = {container_id for _, kind, container_id in due if kind == "warn"}
+        expire = {container_id for _, kind, container_id in due if kind == "expire"}
+        candidates, orphaned, warned = [], [], []
+        
+        # Holding the lock across the list call means no record can be added between
+        # the snapshot of containers and the write, so new instances never look orphaned
+        with database_lock:
+            data = load_database()
+            existing = {container['id'] for container in runtime.list_containers(all=True)}
+            
+            for user_id in list(data):
+                kept = []
+                for container in data[user_id]:
+                    container_id = container["container_id"]
+                    expires_at = container.get("expires_at")
+                    # Heap entries may be stale (record removed or TTL changed), the record decides
+                    expires_at = datetime.datetime.fromisoformat(expires_at).timestamp() if expires_at else None
+                    
+                    if container_id not in existing:
+                        orphaned.append(container_id)
+                        continue
+                    if container_id in expire and expires_at and expires_at <= now:
+                        candidates.append((user_id, container_id, expires_at))
+                    elif container_id in warn and expires_at and not container.get("expiry_warned"):
+                        container["expiry_warned"] = True
+                        warned.append((user_id, container_id, expires_at))
+                    kept.append(container)
+                
+                if kept:
+                    data[user_id] = kept
+                else:
+                    del data[user_id]
+            
+            if orphaned or warned:
+                save_database(data)
+        
+        # Records are only dropped once their container is gone, so a failed remove is retried
+        expired, retry = [], []
+        for user_id, container_id, expires_at in candidates:
+            try:
+                runtime.remove(container_id, force=True)
+            except docker.errors.NotFound:
+                pass
+            except docker.errors.DockerException as e:
+                logger.error(f"Error removing expired container {container_id[:12]}: {e}")
+                retry.append((expires_at, "expire", container_id))
+                continue
+            expired.append((user_id, container_id))
+        self.requeue(retry)
+        
+        if expired:
+            removed = {container_id for _, container_id in expired}
+            with database_lock:
+                data = load_database()
+                for user_id in list(data):
+                    data[user_id] = [c for c in data[user_id] if c["container_id"] not in removed]
+                    if not data[user_id]:
+                        del data[user_id]
+                save_database(data)
+        
+        for user_id, container_id in expired:
+            notify(
+                [int(user_id)], "⌛ Instance Expired",
+                f"Instance `{container_id[:12]}` reached the end of its lifetime and was removed.",
+                0xff0000
+            )
+        
+        for user_id, container_id, expires_at in warned:
+            notify(
+                [int(user_id)], "⌛ Instance Expiring Soon",
+                f"Instance `{container_id[:12]}` will be removed <t:{int(expires_at)}:R>. "
+                "Back up anything you want to keep.",
+                0xffa500
+            )
+        
+        for container_id in orphaned + [container_id for _, container_id in expired]:
+            abuse_detector.forget(container_id)
+            if usage_store is not None:
+                usage_store.release(container_id)
+        
+        if expired or orphaned:
+            logger.info(f"Sweep removed {len(expired)} expired and {len(orphaned)} orphaned instances")
+
+expiry_scheduler = ExpiryScheduler(SWEEP_INTERVAL)
+
+def format_expiry(expires_at: Optional[str]) -> str:
+    if not expires_at:
+        return "Never"
+    return f"<t:{int(datetime.datetime.fromisoformat(expires_at).timestamp())}:R>"
+
+# Storage usage
+def directory_size(path: str) -> int:
+    """Disk space used by everything under `path`, without following symlinks"""
+    total = 0
+    pending = [path]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_blocks * 512
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total
+
+class VolumeUsageTracker:
+    """Caches the size of every user volume, re-measuring one volume at a time in the background.
+
+    A full pass over all volumes is spread across VOLUME_SCAN_CYCLE, so requests
+    only ever read the cache. Volumes whose mountpoint the bot can't read (e.g.
+    a remote daemon) are sized from one runtime-wide size report per pass instead.
+    """
+    
+    def __init__(self, cycle: float):
+        self.cycle = cycle
+        self.usage: Dict[str, Dict] = {}
+        self.pending = collections.deque()
+        self.system_df = None
+        self.over_quota = set()
+        self.grace: Dict[str, float] = {}
+        self.thread = None
+    
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="volume-usage", daemon=True)
+            self.thread.start()
+    
+    def run(self):
+        while True:
+            delay = self.cycle
+            try:
+                if not self.pending:
+                    volumes = runtime.list_volumes(VOLUME_LABEL)
+                    self.pending.extend(volumes)
+                    self.system_df = None
+                    # Forget volumes that were deleted since the last pass
+                    names = {volume['name'] for volume in volumes}
+                    for name in set(self.usage) - names:
+                        del self.usage[name]
+                if self.pending:
+                    self.measure(self.pending.popleft())
+                    delay = self.cycle / max(1, len(self.usage), len(self.pending))
+            except Exception as e:
+                logger.error(f"Error measuring volume usage: {e}")
+            time.sleep(max(0.5, delay))
+    
+    def measure(self, volume: Dict):
+        name = volume['name']
+        mountpoint = volume['mountpoint']
+        if mountpoint and os.access(mountpoint, os.R_OK | os.X_OK):
+            size = directory_size(mountpoint)
+        else:
+            size = self.df_size(name)
+        
+        previous = self.usage.get(name)
+        self.usage[name] = {'bytes': size, 'measured_at': time.time()}
+        
+        owner = volume['labels'].get(VOLUME_LABEL)
+        if not owner:
+            return
+        
+        if size > VOLUME_QUOTA_BYTES:
+            exceeded = name not in self.over_quota
+            self.over_quota.add(name)
+            stopped = self.stop_instances(owner) if time.time() >= self.grace.get(name, 0) else []
+            if exceeded or stopped:
+                notify(
+                    [int(owner)], "💾 Storage Quota Exceeded",
+                    f"Your persistent storage uses {format_bytes(size)} of {format_bytes(VOLUME_QUOTA_BYTES)}"
+                    + (f", so {len(stopped)} running instance(s) were stopped. " if stopped else ". ")
+                    + (f"You can start an instance for {VOLUME_QUOTA_GRACE // 60} minutes to free up space in "
+                       f"`{VOLUME_MOUNT_PATH}`." if name not in self.grace else "Contact an admin to free up space."),
+                    0xffa500
+                )
+        else:
+            self.over_quota.discard(name)
+            self.grace.pop(name, None)
+        
+        # The quota is only checked once per cycle, so while the host disk is below its
+        # reserve any volume that is still growing gets its writers stopped right away
+        if previous and size > previous['bytes'] and psutil.disk_usage('/').free < HOST_DISK_RESERVE_BYTES:
+            stopped = self.stop_instances(owner)
+            if stopped:
+                logger.warning(f"Host disk below reserve, stopped {len(stopped)} instance(s) writing to {name}")
+                notify(
+                    [int(owner)] + ADMIN_IDS, "💾 Host Disk Full",
+                    f"The host is running out of disk space while your storage keeps growing, "
+                    f"so {len(stopped)} running instance(s) were stopped.",
+                    0xff0000
+                )
+    
+    def stop_instances(self, owner: str) -> List[str]:
+        stopped = []
+        for container in get_user_containers(owner):
+            if container.get('status') != 'running':
+                continue
+            container_id = container['container_id']
+            try:
+                runtime.stop(container_id)
+            except docker.errors.DockerException as e:
+                logger.error(f"Error stopping {container_id[:12]} for storage: {e}")
+                continue
+            update_container_status(container_id, "stopped")
+            stopped.append(container_id)
+        return stopped
+    
+    def allow_cleanup(self, user_id: str) -> bool:
+        """Let an over-quota user run instances once for VOLUME_QUOTA_GRACE to delete data"""
+        deadline = self.grace.setdefault(user_volume_name(user_id), time.time() + VOLUME_QUOTA_GRACE)
+        return time.time() < deadline
+    
+    def df_size(self, name: str) -> int:
+        if self.system_df is None:
+            self.system_df = runtime.volume_sizes()
+        return self.system_df.get(name, 0)
+    
+    def get(self, user_id: str) -> Optional[Dict]:
+        usage = self.usage.get(user_volume_name(user_id))
+        if usage is None:
+            return None
+        return {**usage, 'quota': VOLUME_QUOTA_BYTES}
+
+volume_tracker = VolumeUsageTracker(VOLUME_SCAN_CYCLE)
+
+def get_storage_usage(user_id: str) -> Optional[Dict]:
+    return volume_tracker.get(user_id)
+
+def check_storage(user_id: str, action: str = "deploy") -> Optional[str]:
+    """Reason the user may not deploy or start an instance right now, or None"""
+    usage = volume_tracker.get(user_id)
+    if usage and usage['bytes'] > VOLUME_QUOTA_BYTES and not (action == "start" and volume_tracker.allow_cleanup(user_id)):
+        return (
+            f"Your persistent storage uses {format_bytes(usage['bytes'])} of "
+            f"{format_bytes(VOLUME_QUOTA_BYTES)}. Free up space in `{VOLUME_MOUNT_PATH}` first."
+        )
+    if psutil.disk_usage('/').free < HOST_DISK_RESERVE_BYTES:
+        return "The host is running low on disk space. Please try again later."
+    return None
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}" if unit != "B" else f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+def format_storage(usage: Optional[Dict]) -> str:
+    if not usage:
+        return "Not measured yet"
+    return f"{format_bytes(usage['bytes'])}/{format_bytes(usage['quota'])} (<t:{int(usage['measured_at'])}:R>)"
+
+# Orchestration
+# Every blocking Docker or database call goes through orchestrate(). In a single
+# process it runs on a thread pool so it never blocks the gateway; in cluster
+# mode shard workers forward it over IPC to the orchestration worker, which is
+# the only process holding the container runtime and writing the database.
+# Streaming ops (generators) go through orchestrate_stream() the same way.
+ORCHESTRATOR_OPS = {
+    "load_database": load_database,
+    "add_to_database": add_to_database,
+    "remove_from_database": remove_from_database,
+    "update_container_status": update_container_status,
+    "update_ssh_command": update_ssh_command,
+    "get_user_containers": get_user_containers,
+    "count_user_containers": count_user_containers,
+    "count_all_containers": count_all_containers,
+    "get_container_info": get_container_info,
+    "get_container_stats": get_container_stats,
+    "get_container_status": get_container_status,
+    "image_exists": image_exists,
+    "pull_image": pull_image,
+    "run_container": run_container,
+    "generate_ssh_session": generate_ssh_session,
+    "container_action": container_action,
+    "get_host_stats": get_host_stats,
+    "get_usage_summary": get_usage_summary,
+    "get_top_consumers": get_top_consumers,
+    "get_storage_usage": get_storage_usage,
+    "check_storage": check_storage,
+    "drain_notifications": drain_notifications,
+}
+
+ORCHESTRATOR_STREAMS = {
+    "stream_logs": stream_logs,
+    "stream_exec": stream_exec,
+}
+
+REMOTE_ERRORS = {
+    "NotFound": docker.errors.NotFound,
+    "ImageNotFound": docker.errors.ImageNotFound,
+    "APIError": docker.errors.APIError,
+    "DockerException": docker.errors.DockerException,
+    "ValueError": ValueError,
+    "ConnectionError": ConnectionError,
+}
+
+executor = concurrent.futures.ThreadPoolExecutor(max_workers=ORCHESTRATOR_THREADS)
+stream_executor = concurrent.futures.ThreadPoolExecutor(max_workers=STREAM_THREADS)
+orchestrator_client = None  # Set in shard workers, None when orchestrating in-process
 
-def add_to_database(user_id: str, container_id: str, ssh_command: str, image_name: str):
-    data = load_database()
-    
-    if user_id not in data:
-        data[user_id] = []
+def remote_error(error: Dict) -> Exception:
+    return REMOTE_ERRORS.get(error["type"], Exception)(error["message"])
+
+async def orchestrate(op: str, *args):
+    if orchestrator_client is not None:
+        return await orchestrator_client.call(op, *args)
     
-    data[user_id].append({
-        "container_id": container_id,
-        "ssh_command": ssh_command,
-        "image": image_name,
-        "created_at": datetime.datetime.now().isoformat(),
-        "status": "running"
-    })
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, ORCHESTRATOR_OPS[op], *args)
+
+async def orchestrate_stream(op: str, *args):
+    if orchestrator_client is not None:
+        stream = orchestrator_client.stream(op, *args)
+    else:
+        stream = stream_in_process(op, args, threading.Event())
     
-    save_database(data)
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        await stream.aclose()
 
-def remove_from_database(container_id: str):
-    data = load_database()
+async def stream_in_process(op: str, args: list, cancelled: threading.Event):
+    """Run a streaming op on a worker thread, handing chunks over through a bounded queue.
+
+    The producer blocks while the queue is full, so a slow consumer (e.g. one
+    waiting on Discord rate limits) stops the op from reading further ahead.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
     
-    for user_id, containers in data.items():
-        data[user_id] = [c for c in containers if c["container_id"] != container_id]
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+    
+    def produce():
+        try:
+            for chunk in ORCHESTRATOR_STREAMS[op](cancelled, *args):
+                put(("chunk", chunk))
+                if cancelled.is_set():
+                    break
+            put(("done", None))
+        except Exception as e:
+            put(("error", e))
     
-    save_database(data)
+    loop.run_in_executor(stream_executor, produce)
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        # Unblock the producer so it can notice the cancellation and exit
+        cancelled.set()
+        while not queue.empty():
+            queue.get_nowait()
 
-def update_container_status(container_id: str, status: str):
-    data = load_database()
+class OrchestratorClient:
+    """Multiplexes orchestration calls from a shard worker over one IPC connection"""
     
-    for user_id, containers in data.items():
-        for container in containers:
-            if container["container_id"] == container_id:
-                container["status"] = status
+    def __init__(self, path: str):
+        self.path = path
+        self.reader = None
+        self.writer = None
+        self.listener = None
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.streams: Dict[int, asyncio.Queue] = {}
+        self.next_id = 0
+        self.lock = asyncio.Lock()
     
-    save_database(data)
-
-from typing import List, Dict
-
-def get_user_containers(user_id: str) -> List[Dict]:
-    data = load_database()
-    return data.get(str(user_id), [])
-
-def count_user_containers(user_id: str) -> int:
-    return len(get_user_containers(user_id))
-
-def get_container_info(container_id: str) -> Optional[Dict]:
-    data = load_database()
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_unix_connection(self.path, limit=IPC_LINE_LIMIT)
+        self.listener = asyncio.create_task(self.listen(self.reader))
     
-    for user_id, containers in data.items():
-        for container in containers:
-            if container["container_id"] == container_id:
-                return container
-    return None
-
-# Docker helper functions
-async def get_container_stats(container_id: str) -> Dict:
-    try:
-        container = client.containers.get(container_id)
-        stats = container.stats(stream=False)
+    async def listen(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                if response["id"] in self.streams:
+                    # Stream output is capped by the orchestrator, so this queue stays bounded
+                    if "error" in response or response.get("done"):
+                        # Finished streams are unregistered here, so stream() only cancels on early exit
+                        self.streams.pop(response["id"]).put_nowait(response)
+                    else:
+                        self.streams[response["id"]].put_nowait(response)
+                    continue
+                future = self.pending.pop(response["id"], None)
+                if future and not future.done():
+                    future.set_result(response)
+        except Exception as e:
+            logger.error(f"Orchestrator connection failed: {e}")
+        finally:
+            self.writer = None
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Lost connection to orchestrator"))
+            self.pending.clear()
+            for queue in self.streams.values():
+                queue.put_nowait({"error": {"type": "ConnectionError", "message": "Lost connection to orchestrator"}})
+            self.streams.clear()
+    
+    async def call(self, op: str, *args):
+        future = asyncio.get_running_loop().create_future()
         
-        cpu_percent = 0.0
-        memory_usage = 0
-        memory_limit = 0
+        async with self.lock:
+            if self.writer is None:
+                await self.connect()
+            
+            self.next_id += 1
+            self.pending[self.next_id] = future
+            self.writer.write(json.dumps({"id": self.next_id, "op": op, "args": args}).encode() + b"\n")
+            await self.writer.drain()
         
-        if 'cpu_stats' in stats and 'precpu_stats' in stats:
-            cpu_delta = stats['cpu_stats']['cpu_usage']['total_usage'] - stats['precpu_stats']['cpu_usage']['total_usage']
-            system_delta = stats['cpu_stats']['system_cpu_usage'] - stats['precpu_stats']['system_cpu_usage']
+        response = await future
+        if "error" in response:
+            raise remote_error(response["error"])
+        return response["result"]
+    
+    async def stream(self, op: str, *args):
+        queue = asyncio.Queue()
+        
+        async with self.lock:
+            if self.writer is None:
+                await self.connect()
             
-            if system_delta > 0 and cpu_delta > 0:
-                cpu_percent = (cpu_delta / system_delta) * len(stats['cpu_stats']['cpu_usage']['percpu_usage']) * 100
+            self.next_id += 1
+            request_id = self.next_id
+            self.streams[request_id] = queue
+            self.writer.write(json.dumps({"id": request_id, "op": op, "args": args, "stream": True}).encode() + b"\n")
+            await self.writer.drain()
         
-        if 'memory_stats' in stats:
-            memory_usage = stats['memory_stats'].get('usage', 0)
-            memory_limit = stats['memory_stats'].get('limit', 1)
+        try:
+            while True:
+                response = await queue.get()
+                if "error" in response:
+                    raise remote_error(response["error"])
+                if response.get("done"):
+                    return
+                yield response["chunk"]
+        finally:
+            writer = self.writer
+            if self.streams.pop(request_id, None) is not None and writer is not None:
+                # Stopped early, tell the orchestrator to stop producing
+                try:
+                    writer.write(json.dumps({"id": request_id, "cancel": True}).encode() + b"\n")
+                    await writer.drain()
+                except ConnectionError:
+                    pass
+
+async def handle_orchestrator_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    loop = asyncio.get_running_loop()
+    write_lock = asyncio.Lock()
+    running = set()
+    cancels: Dict[int, threading.Event] = {}
+    
+    async def send(response: Dict):
+        async with write_lock:
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+    
+    async def run(request: Dict):
+        try:
+            result = await loop.run_in_executor(executor, ORCHESTRATOR_OPS[request["op"]], *request["args"])
+            response = {"id": request["id"], "result": result}
+        except Exception as e:
+            response = {"id": request["id"], "error": {"type": type(e).__name__, "message": str(e)}}
         
-        return {
-            'cpu_percent': round(cpu_percent, 2),
-            'memory_usage': memory_usage,
-            'memory_limit': memory_limit,
-            'memory_percent': round((memory_usage / memory_limit) * 100, 2) if memory_limit else 0,
-            'online': container.status == 'running'
-        }
+        await send(response)
+    
+    async def run_stream(request: Dict):
+        cancelled = cancels[request["id"]] = threading.Event()
+        try:
+            # drain() in send() pushes socket backpressure through to the producer's queue
+            async for chunk in stream_in_process(request["op"], request["args"], cancelled):
+                await send({"id": request["id"], "chunk": chunk})
+            response = {"id": request["id"], "done": True}
+        except Exception as e:
+            response = {"id": request["id"], "error": {"type": type(e).__name__, "message": str(e)}}
+        finally:
+            cancels.pop(request["id"], None)
+        
+        await send(response)
+    
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            request = json.loads(line)
+            
+            if request.get("cancel"):
+                if request["id"] in cancels:
+                    cancels[request["id"]].set()
+                continue
+            
+            task = asyncio.create_task(run_stream(request) if request.get("stream") else run(request))
+            running.add(task)
+            task.add_done_callback(running.discard)
     except Exception as e:
-        logger.error(f"Error getting stats for container {container_id}: {e}")
-        return None
+        logger.error(f"Shard connection failed: {e}")
+    finally:
+        for cancelled in cancels.values():
+            cancelled.set()
+        writer.close()
 
-async def capture_ssh_session_line(process) -> Optional[str]:
-    while True:
-        output = await process.stdout.readline()
-        if not output:
-            break
-        output = output.decode('utf-8').strip()
-        if "ssh session:" in output:
-            return output.split("ssh session:")[1].strip()
-    return None
-
-async def execute_command(command: str) -> tuple:
-    process = await asyncio.create_subprocess_shell(
-        command,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
+async def serve_orchestrator():
+    if os.path.exists(ORCHESTRATOR_SOCKET):
+        os.remove(ORCHESTRATOR_SOCKET)
+    
+    server = await asyncio.start_unix_server(
+        handle_orchestrator_connection,
+        path=ORCHESTRATOR_SOCKET,
+        limit=IPC_LINE_LIMIT
     )
-    stdout, stderr = await process.communicate()
-    return stdout.decode(), stderr.decode()
+    os.chmod(ORCHESTRATOR_SOCKET, 0o600)
+    logger.info(f"Orchestrator listening on {ORCHESTRATOR_SOCKET}")
+    
+    async with server:
+        await server.serve_forever()
 
 # Bot events
 @bot.event
 async def on_ready():
-    change_status.start()
-    logger.info(f'Bot is ready. Logged in as {bot.user}')
-    await bot.tree.sync()
+    if not change_status.is_running():
+        change_status.start()
+    if not deliver_notifications.is_running():
+        deliver_notifications.start()
+    logger.info(f'Bot is ready. Logged in as {bot.user} (shards: {bot.shard_ids or "all"})')
+    
+    # Commands are global, so only the worker running shard 0 needs to sync them
+    if bot.shard_ids is None or 0 in bot.shard_ids:
+        await bot.tree.sync()
 
 @tasks.loop(seconds=30)
 async def change_status():
     try:
-        data = load_database()
-        total_instances = sum(len(containers) for containers in data.values())
+        total_instances = await orchestrate("count_all_containers")
         
         statuses = [
             f"Managing {total_instances} instances",
@@ -251,11 +2134,32 @@ async def change_status():
     except Exception as e:
         logger.error(f"Failed to update status: {e}")
 
+@tasks.loop(seconds=NOTIFICATION_INTERVAL)
+async def deliver_notifications():
+    try:
+        pending = await orchestrate("drain_notifications")
+    except Exception as e:
+        logger.error(f"Failed to fetch notifications: {e}")
+        return
+    
+    for notification in pending:
+        embed = discord.Embed(
+            title=notification['title'],
+            description=notification['description'],
+            color=notification['color']
+        )
+        for user_id in notification['user_ids']:
+            try:
+                user = await bot.fetch_user(user_id)
+                await user.send(embed=embed)
+            except discord.HTTPException as e:
+                logger.warning(f"Could not send notification to user {user_id}: {e}")
+
 # Command functions
 async def create_server_task(interaction: discord.Interaction, image_name: str):
     user = str(interaction.user.id)
     
-    if count_user_containers(user) >= SERVER_LIMIT:
+    if await orchestrate("count_user_containers", user) >= SERVER_LIMIT:
         embed = discord.Embed(
             title="Instance Limit Reached",
             description=f"You can only have {SERVER_LIMIT} instances at a time.",
@@ -274,6 +2178,16 @@ async def create_server_task(interaction: discord.Interaction, image_name: str):
         await interaction.followup.send(embed=embed)
         return
     
+    storage_problem = await orchestrate("check_storage", user)
+    if storage_problem:
+        embed = discord.Embed(
+            title="Not Enough Storage",
+            description=storage_problem,
+            color=0xff0000
+        )
+        await interaction.followup.send(embed=embed)
+        return
+    
     # Send initial embed with loading animation
     embed = discord.Embed(
         title=f"🚀 Deploying {image_data['display_name']} Instance",
@@ -289,14 +2203,12 @@ async def create_server_task(interaction: discord.Interaction, image_name: str):
         embed.set_field_at(0, name="Status", value="🔍 Checking Docker image...", inline=False)
         await message.edit(embed=embed)
         
-        try:
-            client.images.get(image_data['name'])
-        except docker.errors.ImageNotFound:
+        if not await orchestrate("image_exists", image_data['name']):
             embed.set_field_at(0, name="Status", value="⬇️ Downloading Docker image...", inline=False)
             await message.edit(embed=embed)
             
             try:
-                client.images.pull(image_data['name'])
+                await orchestrate("pull_image", image_data['name'])
             except docker.errors.DockerException as e:
                 logger.error(f"Error pulling image {image_data['name']}: {e}")
                 raise Exception(f"Failed to download Docker image: {e}")
@@ -306,16 +2218,7 @@ async def create_server_task(interaction: discord.Interaction, image_name: str):
         await message.edit(embed=embed)
         
         try:
-            container = client.containers.run(
-                image_data['name'],
-                detach=True,
-                tty=True,
-                mem_limit='6g',  # 6GB memory limit
-                cpu_quota=200000,  # Limit CPU usage
-                cpu_shares=512,  # CPU priority
-                restart_policy={"Name": "on-failure", "MaximumRetryCount": 3}
-            )
-            container_id = container.id
+            container_id = await orchestrate("run_container", image_data['name'], user)
         except docker.errors.DockerException as e:
             logger.error(f"Error creating container: {e}")
             raise Exception(f"Failed to create container: {e}")
@@ -325,23 +2228,17 @@ async def create_server_task(interaction: discord.Interaction, image_name: str):
         await message.edit(embed=embed)
         
         try:
-            exec_cmd = await asyncio.create_subprocess_exec(
-                "docker", "exec", container_id, "tmate", "-F",
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            ssh_session_line = await capture_ssh_session_line(exec_cmd)
+            ssh_session_line = await orchestrate("generate_ssh_session", container_id)
             
             if not ssh_session_line:
                 raise Exception("Failed to generate SSH session")
         except Exception as e:
             logger.error(f"Error generating SSH session: {e}")
-            container.stop()
-            container.remove()
+            await orchestrate("container_action", container_id, "remove")
             raise Exception(f"Failed to generate SSH session: {e}")
         
         # Step 4: Finalize
-        add_to_database(user, container_id, ssh_session_line, image_name)
+        await orchestrate("add_to_database", user, container_id, ssh_session_line, image_name)
         
         # Create success embed
         success_embed = discord.Embed(
@@ -359,6 +2256,11 @@ async def create_server_task(interaction: discord.Interaction, image_name: str):
             value=f"{image_data['ram']} RAM | {image_data['cpu']} CPU",
             inline=True
         )
+        success_embed.add_field(
+            name="Persistent Storage",
+            value=f"Files in `{VOLUME_MOUNT_PATH}` are kept when the instance is removed ({format_bytes(VOLUME_QUOTA_BYTES)} quota)",
+            inline=False
+        )
         success_embed.add_field(
             name="Management",
             value=f"Use `/stop {container_id[:12]}` to stop this instance",
@@ -402,7 +2304,7 @@ async def create_server_task(interaction: discord.Interaction, image_name: str):
 
 async def manage_server(interaction: discord.Interaction, action: str, container_id: str):
     user = str(interaction.user.id)
-    container_info = get_container_info(container_id)
+    container_info = await orchestrate("get_container_info", container_id)
     
     if not container_info:
         embed = discord.Embed(
@@ -422,29 +2324,36 @@ async def manage_server(interaction: discord.Interaction, action: str, container
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
     
+    if container_info.get('status') == 'suspended' and action != "remove" and interaction.user.id not in ADMIN_IDS:
+        embed = discord.Embed(
+            title="Instance Suspended",
+            description="This instance was paused for excessive resource usage. Contact an admin to resume it.",
+            color=0xff0000
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+    
+    if action == "start" and interaction.user.id not in ADMIN_IDS:
+        storage_problem = await orchestrate("check_storage", container_info['user_id'], action)
+        if storage_problem:
+            embed = discord.Embed(
+                title="Not Enough Storage",
+                description=storage_problem,
+                color=0xff0000
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+    
+    container_id = container_info['container_id']
+    statuses = {"start": "started", "stop": "stopped", "restart": "restarted", "remove": "removed"}
+    
     try:
-        container = client.containers.get(container_id)
         image_data = DOCKER_IMAGES.get(container_info['image'], {})
         
-        if action == "start":
-            container.start()
-            status = "started"
-            update_container_status(container_id, "running")
-        elif action == "stop":
-            container.stop()
-            status = "stopped"
-            update_container_status(container_id, "stopped")
-        elif action == "restart":
-            container.restart()
-            status = "restarted"
-            update_container_status(container_id, "running")
-        elif action == "remove":
-            container.stop()
-            container.remove()
-            remove_from_database(container_id)
-            status = "removed"
-        else:
+        if action not in statuses:
             raise ValueError("Invalid action")
+        await orchestrate("container_action", container_id, action)
+        status = statuses[action]
         
         embed = discord.Embed(
             title=f"Instance {status.capitalize()}",
@@ -453,7 +2362,7 @@ async def manage_server(interaction: discord.Interaction, action: str, container
         )
         
         if action != "remove":
-            stats = await get_container_stats(container_id)
+            stats = await orchestrate("get_container_stats", container_id)
             if stats:
                 embed.add_field(
                     name="Resources",
@@ -466,14 +2375,10 @@ async def manage_server(interaction: discord.Interaction, action: str, container
         if action in ["start", "restart"]:
             # Regenerate SSH session after restart
             try:
-                exec_cmd = await asyncio.create_subprocess_exec(
-                    "docker", "exec", container_id, "tmate", "-F",
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                ssh_session_line = await capture_ssh_session_line(exec_cmd)
+                ssh_session_line = await orchestrate("generate_ssh_session", container_id)
                 
                 if ssh_session_line:
+                    await orchestrate("update_ssh_command", container_id, ssh_session_line)
                     dm_embed = discord.Embed(
                         title=f"🔑 New SSH Session for {image_data.get('display_name', 'Instance')}",
                         description=f"```{ssh_session_line}```",
@@ -495,7 +2400,7 @@ async def manage_server(interaction: discord.Interaction, action: str, container
             color=0xff0000
         )
         await interaction.response.send_message(embed=embed)
-        remove_from_database(container_id)
+        await orchestrate("remove_from_database", container_id)
     except docker.errors.DockerException as e:
         embed = discord.Embed(
             title="Error Managing Instance",
@@ -506,7 +2411,7 @@ async def manage_server(interaction: discord.Interaction, action: str, container
 
 async def regen_ssh_command(interaction: discord.Interaction, container_id: str):
     user = str(interaction.user.id)
-    container_info = get_container_info(container_id)
+    container_info = await orchestrate("get_container_info", container_id)
     
     if not container_info:
         embed = discord.Embed(
@@ -526,29 +2431,20 @@ async def regen_ssh_command(interaction: discord.Interaction, container_id: str)
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
     
+    container_id = container_info['container_id']
     await interaction.response.defer()
     
     try:
-        container = client.containers.get(container_id)
-        if container.status != 'running':
+        if await orchestrate("get_container_status", container_id) != 'running':
             raise Exception("Instance is not running")
         
-        exec_cmd = await asyncio.create_subprocess_exec(
-            "docker", "exec", container_id, "tmate", "-F",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        ssh_session_line = await capture_ssh_session_line(exec_cmd)
+        ssh_session_line = await orchestrate("generate_ssh_session", container_id)
         
         if not ssh_session_line:
             raise Exception("Failed to generate SSH session")
         
         # Update the database with new SSH command
-        for user_id, containers in load_database().items():
-            for container in containers:
-                if container["container_id"] == container_id:
-                    container["ssh_command"] = ssh_session_line
-        save_database(load_database())
+        await orchestrate("update_ssh_command", container_id, ssh_session_line)
         
         image_data = DOCKER_IMAGES.get(container_info['image'], {})
         
@@ -579,8 +2475,105 @@ async def regen_ssh_command(interaction: discord.Interaction, container_id: str)
         )
         await interaction.followup.send(embed=embed)
 
+def escape_code(text: str) -> str:
+    # Separating every pair of adjacent backticks means no run of them can close the block
+    return re.sub(r"`(?=`)", "`\u200b", text)
+
+def code_block(text: str) -> str:
+    return "```\n" + (escape_code(text) or " ") + "\n```"
+
+def split_page(text: str) -> tuple:
+    """Longest prefix of `text` that fits STREAM_PAGE_CHARS once escaped, and the remainder"""
+    end = STREAM_PAGE_CHARS
+    # Escaping only ever grows the text, so cutting the overflow converges quickly
+    while len(escape_code(text[:end])) > STREAM_PAGE_CHARS:
+        end -= len(escape_code(text[:end])) - STREAM_PAGE_CHARS
+    return text[:end], text[end:]
+
+async def send_paginated(interaction: discord.Interaction, chunks):
+    """Send streamed text as code-block pages, editing the newest page live as output arrives"""
+    buffer = ""
+    message = None
+    last_edit = 0.0
+    sent = False
+    
+    async for text in chunks:
+        buffer += text
+        
+        # Finish every full page; the remainder starts the next one. Pages are measured
+        # after escaping, which adds a character per adjacent pair of backticks
+        while len(escape_code(buffer)) > STREAM_PAGE_CHARS:
+            page, buffer = split_page(buffer)
+            if message:
+                await message.edit(content=code_block(page))
+            else:
+                await interaction.followup.send(content=code_block(page))
+            message = None
+            sent = True
+        
+        if buffer and time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL:
+            if message:
+                await message.edit(content=code_block(buffer))
+            else:
+                message = await interaction.followup.send(content=code_block(buffer))
+            last_edit = time.monotonic()
+            sent = True
+    
+    if message:
+        await message.edit(content=code_block(buffer))
+    elif buffer or not sent:
+        await interaction.followup.send(content=code_block(buffer or "(no output)"))
+
+async def stream_instance_output(interaction: discord.Interaction, container_id: str, title: str, op: str, *args):
+    user = str(interaction.user.id)
+    container_info = await orchestrate("get_container_info", container_id)
+    
+    if not container_info:
+        embed = discord.Embed(
+            title="Instance Not Found",
+            description="No instance found with that ID.",
+            color=0xff0000
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+    
+    if container_info['user_id'] != user and interaction.user.id not in ADMIN_IDS:
+        embed = discord.Embed(
+            title="Permission Denied",
+            description="You don't have permission to access this instance.",
+            color=0xff0000
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+    
+    container_id = container_info['container_id']
+    await interaction.response.defer()
+    
+    try:
+        await interaction.followup.send(embed=discord.Embed(
+            title=title,
+            description=f"Instance `{container_id[:12]}` (up to {STREAM_MAX_BYTES // 1024}KB, {STREAM_MAX_SECONDS}s)",
+            color=0x3498db
+        ))
+        await send_paginated(interaction, orchestrate_stream(op, container_id, *args))
+    
+    except docker.errors.NotFound:
+        embed = discord.Embed(
+            title="Instance Not Found",
+            description="The container no longer exists.",
+            color=0xff0000
+        )
+        await interaction.followup.send(embed=embed)
+    except Exception as e:
+        embed = discord.Embed(
+            title="Error Streaming Output",
+            description=str(e),
+            color=0xff0000
+        )
+        await interaction.followup.send(embed=embed)
+
 async def show_instance_info(interaction: discord.Interaction, container_id: str):
-    container_info = get_container_info(container_id)
+    container_info = await orchestrate("get_container_info", container_id)
     
     if not container_info:
         embed = discord.Embed(
@@ -601,12 +2594,15 @@ async def show_instance_info(interaction: discord.Interaction, container_id: str
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
     
+    container_id = container_info['container_id']
     await interaction.response.defer()
     
     try:
-        container = client.containers.get(container_id)
+        container_status = await orchestrate("get_container_status", container_id)
         image_data = DOCKER_IMAGES.get(container_info['image'], {})
-        stats = await get_container_stats(container_id)
+        stats = await orchestrate("get_container_stats", container_id)
+        usage = await orchestrate("get_usage_summary", container_id)
+        storage = await orchestrate("get_storage_usage", container_info['user_id'])
         
         embed = discord.Embed(
             title=f"{image_data.get('display_name', 'Instance')} Details",
@@ -619,7 +2615,7 @@ async def show_instance_info(interaction: discord.Interaction, container_id: str
         )
         embed.add_field(
             name="Status",
-            value=container.status.capitalize(),
+            value=container_status.capitalize(),
             inline=True
         )
         embed.add_field(
@@ -627,6 +2623,16 @@ async def show_instance_info(interaction: discord.Interaction, container_id: str
             value=datetime.datetime.fromisoformat(container_info['created_at']).strftime('%Y-%m-%d %H:%M'),
             inline=True
         )
+        embed.add_field(
+            name="Expires",
+            value=format_expiry(container_info.get('expires_at')),
+            inline=True
+        )
+        embed.add_field(
+            name=f"Storage ({VOLUME_MOUNT_PATH})",
+            value=format_storage(storage),
+            inline=True
+        )
         
         if stats:
             embed.add_field(
@@ -640,6 +2646,21 @@ async def show_instance_info(interaction: discord.Interaction, container_id: str
                 inline=True
             )
         
+        if usage:
+            lines = []
+            if usage['hour_cpu_avg'] is not None:
+                lines.append(f"CPU 1h avg: {usage['hour_cpu_avg']}%")
+            if usage['day']:
+                lines.append(f"CPU 24h avg: {usage['day']['cpu_avg']}% (peak {usage['day']['cpu_max']}%)")
+                lines.append(f"Memory 24h avg: {usage['day']['memory_avg']}%")
+            if usage['hour_cpu']:
+                lines.append(f"`{sparkline(usage['hour_cpu'], maximum=200)}`")
+            embed.add_field(
+                name="Usage History",
+                value="\n".join(lines),
+                inline=False
+            )
+        
         if container_info.get('ssh_command'):
             embed.add_field(
                 name="SSH Access",
@@ -647,28 +2668,7 @@ async def show_instance_info(interaction: discord.Interaction, container_id: str
                 inline=False
             )
         
-        view = View()
-        if container.status == 'running':
-            stop_button = Button(label="Stop", style=discord.ButtonStyle.red, emoji="⏹️")
-            stop_button.callback = lambda i: manage_server(i, "stop", container_id)
-            view.add_item(stop_button)
-            
-            restart_button = Button(label="Restart", style=discord.ButtonStyle.blurple, emoji="🔄")
-            restart_button.callback = lambda i: manage_server(i, "restart", container_id)
-            view.add_item(restart_button)
-        else:
-            start_button = Button(label="Start", style=discord.ButtonStyle.green, emoji="▶️")
-            start_button.callback = lambda i: manage_server(i, "start", container_id)
-            view.add_item(start_button)
-        
-        ssh_button = Button(label="Regen SSH", style=discord.ButtonStyle.gray, emoji="🔑")
-        ssh_button.callback = lambda i: regen_ssh_command(i, container_id)
-        view.add_item(ssh_button)
-        
-        remove_button = Button(label="Remove", style=discord.ButtonStyle.red, emoji="🗑️")
-        remove_button.callback = lambda i: manage_server(i, "remove", container_id)
-        view.add_item(remove_button)
-        
+        view = instance_view(container_id, container_status == 'running')
         await interaction.followup.send(embed=embed, view=view)
     
     except docker.errors.NotFound:
@@ -678,7 +2678,7 @@ async def show_instance_info(interaction: discord.Interaction, container_id: str
             color=0xff0000
         )
         await interaction.followup.send(embed=embed)
-        remove_from_database(container_id)
+        await orchestrate("remove_from_database", container_id)
     except Exception as e:
         embed = discord.Embed(
             title="Error Getting Instance Info",
@@ -692,15 +2692,7 @@ async def show_instance_info(interaction: discord.Interaction, container_id: str
 async def deploy(interaction: discord.Interaction):
     """Show the image selection GUI for deployment"""
     view = ImageSelectView(interaction.user.id)
-    
-    embed = discord.Embed(
-        title="🚀 Deploy a New Instance",
-        description="Select an OS image from the dropdown below:",
-        color=0x3498db
-    )
-    embed.set_footer(text="You have 60 seconds to choose")
-    
-    await interaction.response.send_message(embed=embed, view=view)
+    await interaction.response.send_message(embed=deploy_embed(), view=view)
 
 @bot.tree.command(name="start", description="Start your instance")
 @app_commands.describe(container_id="The ID of your instance (first 12 chars)")
@@ -738,11 +2730,30 @@ async def info(interaction: discord.Interaction, container_id: str):
     """Get detailed information about an instance"""
     await show_instance_info(interaction, container_id)
 
+@bot.tree.command(name="logs", description="Show the latest log output of an instance")
+@app_commands.describe(
+    container_id="The ID of your instance (first 12 chars)",
+    lines=f"How many lines from the end (default {LOGS_DEFAULT_LINES})"
+)
+async def logs(interaction: discord.Interaction, container_id: str, lines: int = LOGS_DEFAULT_LINES):
+    """Tail the container log"""
+    lines = max(1, min(lines, LOGS_MAX_LINES))
+    await stream_instance_output(interaction, container_id, f"📜 Last {lines} Log Lines", "stream_logs", lines)
+
+@bot.tree.command(name="exec", description="Run a command in your instance")
+@app_commands.describe(
+    container_id="The ID of your instance (first 12 chars)",
+    command="Shell command to run"
+)
+async def exec_command(interaction: discord.Interaction, container_id: str, command: str):
+    """Run a shell command and stream its output"""
+    await stream_instance_output(interaction, container_id, f"💻 `{command[:200]}`", "stream_exec", command)
+
 @bot.tree.command(name="list", description="List all your instances")
 async def list_instances(interaction: discord.Interaction):
     """List all instances owned by the user"""
     user = str(interaction.user.id)
-    containers = get_user_containers(user)
+    containers = await orchestrate("get_user_containers", user)
     
     if not containers:
         embed = discord.Embed(
@@ -753,9 +2764,11 @@ async def list_instances(interaction: discord.Interaction):
         await interaction.response.send_message(embed=embed)
         return
     
+    storage = await orchestrate("get_storage_usage", user)
+    
     embed = discord.Embed(
         title="Your Instances",
-        description=f"You have {len(containers)}/{SERVER_LIMIT} instances",
+        description=f"You have {len(containers)}/{SERVER_LIMIT} instances\nStorage: {format_storage(storage)}",
         color=0x3498db
     )
     
@@ -765,7 +2778,7 @@ async def list_instances(interaction: discord.Interaction):
         
         embed.add_field(
             name=f"{image_data.get('display_name', 'Instance')} ({container['container_id'][:12]})",
-            value=f"Status: {status}\nCreated: {datetime.datetime.fromisoformat(container['created_at']).strftime('%Y-%m-%d')}",
+            value=f"Status: {status}\nCreated: {datetime.datetime.fromisoformat(container['created_at']).strftime('%Y-%m-%d')}\nExpires: {format_expiry(container.get('expires_at'))}",
             inline=True
         )
     
@@ -777,14 +2790,10 @@ async def stats(interaction: discord.Interaction):
     await interaction.response.defer()
     
     try:
-        # Get host system stats
-        cpu_percent = psutil.cpu_percent()
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+        host_stats = await orchestrate("get_host_stats")
         
-        # Get Docker stats
-        total_containers = len(client.containers.list(all=True))
-        running_containers = len(client.containers.list())
+        def averages(values: List[float]) -> str:
+            return " · ".join(f"{minutes}m {value}%" for minutes, value in zip((1, 5, 15), values))
         
         embed = discord.Embed(
             title="System Statistics",
@@ -792,22 +2801,27 @@ async def stats(interaction: discord.Interaction):
         )
         embed.add_field(
             name="CPU Usage",
-            value=f"{cpu_percent}%",
-            inline=True
+            value=f"{host_stats['cpu_percent']}% ({averages(host_stats['cpu_averages'])})\n`{sparkline(host_stats['cpu_history'])}`",
+            inline=False
         )
         embed.add_field(
             name="Memory Usage",
-            value=f"{memory.percent}% ({memory.used/1024/1024:.0f}MB/{memory.total/1024/1024:.0f}MB)",
-            inline=True
+            value=f"{host_stats['memory_percent']}% ({host_stats['memory_used']/1024/1024:.0f}MB/{host_stats['memory_total']/1024/1024:.0f}MB, {averages(host_stats['memory_averages'])})\n`{sparkline(host_stats['memory_history'])}`",
+            inline=False
         )
         embed.add_field(
             name="Disk Usage",
-            value=f"{disk.percent}% ({disk.used/1024/1024:.0f}MB/{disk.total/1024/1024:.0f}MB)",
+            value=f"{host_stats['disk_percent']}% ({host_stats['disk_used']/1024/1024:.0f}MB/{host_stats['disk_total']/1024/1024:.0f}MB)\n`{sparkline(host_stats['disk_history'])}`",
+            inline=False
+        )
+        embed.add_field(
+            name="I/O",
+            value=f"Disk: {format_rate(host_stats['disk_read_rate'])} read, {format_rate(host_stats['disk_write_rate'])} write\nNetwork: {format_rate(host_stats['net_sent_rate'])} out, {format_rate(host_stats['net_recv_rate'])} in",
             inline=True
         )
         embed.add_field(
             name="Docker Containers",
-            value=f"{running_containers}/{total_containers} running",
+            value=f"{host_stats['running_containers']}/{host_stats['total_containers']} running",
             inline=True
         )
         
@@ -821,9 +2835,8 @@ async def stats(interaction: discord.Interaction):
         )
         await interaction.followup.send(embed=embed)
 
-@bot.tree.command(name="help", description="Show help information")
-async def help_command(interaction: discord.Interaction):
-    """Show help message"""
+@functools.lru_cache(maxsize=None)
+def help_embed() -> discord.Embed:
     embed = discord.Embed(
         title="Instance Manager Help",
         description="Manage your Docker instances through Discord",
@@ -865,6 +2878,16 @@ async def help_command(interaction: discord.Interaction):
         value="Generate new SSH credentials",
         inline=False
     )
+    embed.add_field(
+        name="/logs <id> [lines]",
+        value="Show the latest log output of an instance",
+        inline=False
+    )
+    embed.add_field(
+        name="/exec <id> <command>",
+        value="Run a command in an instance and show its output",
+        inline=False
+    )
     embed.add_field(
         name="/remove <id>",
         value="Permanently remove an instance",
@@ -876,7 +2899,12 @@ async def help_command(interaction: discord.Interaction):
         inline=False
     )
     
-    await interaction.response.send_message(embed=embed)
+    return embed
+
+@bot.tree.command(name="help", description="Show help information")
+async def help_command(interaction: discord.Interaction):
+    """Show help message"""
+    await interaction.response.send_message(embed=help_embed())
 
 # Admin commands
 @bot.tree.command(name="admin-list", description="[ADMIN] List all instances")
@@ -891,7 +2919,7 @@ async def admin_list(interaction: discord.Interaction):
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
     
-    data = load_database()
+    data = await orchestrate("load_database")
     total_instances = sum(len(containers) for containers in data.values())
     
     embed = discord.Embed(
@@ -912,4 +2940,115 @@ async def admin_list(interaction: discord.Interaction):
     
     await interaction.response.send_message(embed=embed)
 
-bot.run(TOKEN)
\ No newline at end of file
+@bot.tree.command(name="admin-top", description="[ADMIN] Show the heaviest instances over a period")
+@app_commands.describe(hours="How many hours to look back (default 24)", metric="Rank by CPU or memory")
+@app_commands.choices(metric=[
+    app_commands.Choice(name="CPU", value="cpu_avg"),
+    app_commands.Choice(name="Memory", value="memory_avg")
+])
+async def admin_top(interaction: discord.Interaction, hours: int = 24, metric: str = "cpu_avg"):
+    """Admin command to list the top resource consumers"""
+    if interaction.user.id not in ADMIN_IDS:
+        embed = discord.Embed(
+            title="Permission Denied",
+            description="This command is for admins only.",
+            color=0xff0000
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+    
+    hours = max(1, min(hours, USAGE_TOP_MAX_HOURS, USAGE_HOUR_RETENTION // 3600))
+    top = await orchestrate("get_top_consumers", metric, hours * 3600, 20)
+    
+    embed = discord.Embed(
+        title=f"Top {'CPU' if metric == 'cpu_avg' else 'Memory'} Consumers",
+        description=f"Average usage over the last {hours} whole hours, including the current one" if top else "No usage recorded yet.",
+        color=0x3498db
+    )
+    
+    for rank, entry in enumerate(top, 1):
+        embed.add_field(
+            name=f"{rank}. {entry['container_id'][:12]}",
+            value=f"CPU: {entry['cpu_avg']}% (peak {entry['cpu_max']}%)\nMemory: {entry['memory_avg']}%",
+            inline=True
+        )
+    
+    await interaction.response.send_message(embed=embed)
+
+def run_standalone():
+    global runtime
+    runtime = create_runtime()
+    open_usage_store()
+    host_sampler.start()
+    usage_collector.start()
+    expiry_scheduler.start()
+    volume_tracker.start()
+    bot.run(TOKEN)
+
+def run_orchestrator():
+    global runtime
+    runtime = create_runtime()
+    open_usage_store()
+    host_sampler.start()
+    usage_collector.start()
+    expiry_scheduler.start()
+    volume_tracker.start()
+    asyncio.run(serve_orchestrator())
+
+def run_shard_worker(worker: int):
+    global orchestrator_client
+    orchestrator_client = OrchestratorClient(ORCHESTRATOR_SOCKET)
+    bot.shard_count = SHARD_COUNT
+    bot.shard_ids = list(range(worker, SHARD_COUNT, CLUSTER_WORKERS))
+    # discord.py treats an empty shard list as "all shards", which would duplicate every gateway session
+    if not bot.shard_ids:
+        sys.exit(f"Shard worker {worker} has no shards (SHARD_COUNT={SHARD_COUNT}, CLUSTER_WORKERS={CLUSTER_WORKERS})")
+    bot.run(TOKEN)
+
+def run_cluster():
+    """Launch the orchestration worker and CLUSTER_WORKERS shard workers"""
+    if not 1 <= CLUSTER_WORKERS <= SHARD_COUNT:
+        sys.exit(f"CLUSTER_WORKERS must be between 1 and SHARD_COUNT ({SHARD_COUNT}), got {CLUSTER_WORKERS}")
+    
+    if os.path.exists(ORCHESTRATOR_SOCKET):
+        os.remove(ORCHESTRATOR_SOCKET)
+    
+    script = os.path.abspath(__file__)
+    processes = [subprocess.Popen([sys.executable, script, "orchestrator"])]
+    
+    deadline = time.time() + 30
+    while not os.path.exists(ORCHESTRATOR_SOCKET):
+        if processes[0].poll() is not None or time.time() > deadline:
+            processes[0].terminate()
+            sys.exit("Orchestrator failed to start")
+        time.sleep(0.1)
+    
+    for worker in range(CLUSTER_WORKERS):
+        processes.append(subprocess.Popen([sys.executable, script, "shard", str(worker)]))
+    
+    # If any process dies, take the whole cluster down rather than run degraded
+    try:
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            process.wait()
+
+if __name__ == '__main__':
+    role = sys.argv[1] if len(sys.argv) > 1 else "standalone"
+    
+    if role == "standalone":
+        run_standalone()
+    elif role == "orchestrator":
+        run_orchestrator()
+    elif role == "shard":
+        run_shard_worker(int(sys.argv[2]))
+    elif role == "cluster":
+        run_cluster()
+    else:
+        sys.exit(f"Unknown role: {role} (expected standalone, orchestrator, shard or cluster)")
\ No newline at end of file
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# main.py opens its log file relative to the working directory on import
+os.chdir(tempfile.mkdtemp(prefix="bot-tests-"))
+
+import main  # noqa: E402
+
+IMAGE = next(iter(main.DOCKER_IMAGES))
+
+
+@pytest.fixture
+def runtime(tmp_path, monkeypatch):
+    """A zero-latency simulated runtime, with the database and usage files in a fresh directory"""
+    monkeypatch.chdir(tmp_path)
+    backend = main.SimulatedBackend(
+        {kind: 0 for kind in main.SimulatedBackend.LATENCIES},
+        images=[image["name"] for image in main.DOCKER_IMAGES.values()],
+    )
+    monkeypatch.setattr(main, "runtime", backend)
+    monkeypatch.setattr(main, "usage_store", main.UsageStore("usage.bin", "usage.json", 16, 60, 24))
+    monkeypatch.setattr(main, "expiry_scheduler", main.ExpiryScheduler(main.SWEEP_INTERVAL))
+    monkeypatch.setattr(main, "abuse_detector", main.AbuseDetector())
+    monkeypatch.setattr(main, "volume_tracker", main.VolumeUsageTracker(main.VOLUME_SCAN_CYCLE))
+    main.notifications.clear()
+    yield backend
+    main.notifications.clear()
+
+
+@pytest.fixture
+def deploy(runtime):
+    """Create an instance the way /deploy does and return its container ID"""
+    def deploy(user_id: str) -> str:
+        container_id = main.run_container(main.DOCKER_IMAGES[IMAGE]["name"], user_id)
+        main.add_to_database(user_id, container_id, "ssh test@tmate.io", IMAGE)
+        return container_id
+    return deploy
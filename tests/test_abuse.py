@@ -0,0 +1,91 @@
+import pytest
+
+import main
+
+FORK_BOMB = 5000
+
+
+@pytest.fixture
+def collector():
+    return main.UsageCollector(main.USAGE_SAMPLE_INTERVAL, 2)
+
+
+@pytest.fixture
+def fork_bomb(runtime, monkeypatch):
+    """Make every running container report more processes than ABUSE_PIDS_LIMIT"""
+    stats = runtime.stats
+
+    def abusive_stats(container_id, one_shot=False):
+        return {**stats(container_id, one_shot), "pids_stats": {"current": FORK_BOMB}}
+
+    monkeypatch.setattr(runtime, "stats", abusive_stats)
+
+
+def limits(runtime, container_id):
+    container = runtime.get(container_id)
+    return container["cpu_quota"], container["cpu_shares"]
+
+
+def titles():
+    return [notification["title"] for notification in main.notifications]
+
+
+def test_unmanaged_containers_are_left_alone(runtime, deploy, collector, fork_bomb):
+    managed = deploy("1")
+    runtime.pull_image("other-service")
+    unmanaged = runtime.create("other-service", {}, "1g", 50000, 100)
+
+    for _ in range(3):
+        collector.collect()
+
+    assert limits(runtime, unmanaged) == (50000, 100)
+    assert unmanaged not in main.abuse_detector.state
+    assert unmanaged not in main.usage_store.container_slots
+    assert limits(runtime, managed) == (main.ABUSE_THROTTLED_CPU_QUOTA, main.ABUSE_THROTTLED_CPU_SHARES)
+
+
+def test_abuse_escalates_to_suspension_and_admin_start_restores(runtime, deploy, collector, fork_bomb, monkeypatch):
+    monkeypatch.setattr(main, "ABUSE_ESCALATE_SAMPLES", 2)
+    container_id = deploy("1")
+
+    collector.collect()
+    collector.collect()
+    assert limits(runtime, container_id) == (main.ABUSE_THROTTLED_CPU_QUOTA, main.ABUSE_THROTTLED_CPU_SHARES)
+    assert titles() == ["⚠️ Instance Throttled"]
+
+    collector.collect()
+    collector.collect()
+    assert runtime.status(container_id) == "paused"
+    assert main.get_container_info(container_id)["status"] == "suspended"
+    assert titles()[-1] == "⛔ Instance Suspended"
+
+    main.container_action(container_id, "start")
+    assert runtime.status(container_id) == "running"
+    assert limits(runtime, container_id) == (main.CONTAINER_CPU_QUOTA, main.CONTAINER_CPU_SHARES)
+    assert container_id not in main.abuse_detector.state
+
+
+def test_throttle_survives_stop_and_is_lifted_after_recovery(runtime, deploy, collector, monkeypatch):
+    monkeypatch.setattr(main, "ABUSE_RECOVERY_SAMPLES", 2)
+    container_id = deploy("1")
+    main.abuse_detector.observe(container_id, {"cpu_percent": 0, "pids": FORK_BOMB, "egress_rate": 0})
+    assert limits(runtime, container_id) == (main.ABUSE_THROTTLED_CPU_QUOTA, main.ABUSE_THROTTLED_CPU_SHARES)
+
+    main.container_action(container_id, "stop")
+    collector.collect()
+    assert main.abuse_detector.state[container_id]["level"] == main.AbuseDetector.THROTTLED
+
+    main.container_action(container_id, "start")
+    for _ in range(3):
+        collector.collect()
+    assert limits(runtime, container_id) == (main.CONTAINER_CPU_QUOTA, main.CONTAINER_CPU_SHARES)
+    assert titles()[-1] == "Instance Throttling Lifted"
+
+
+def test_limits_left_over_from_a_previous_run_are_reset(runtime, deploy, collector):
+    container_id = deploy("1")
+    runtime.update_limits(container_id, main.ABUSE_THROTTLED_CPU_QUOTA, main.ABUSE_THROTTLED_CPU_SHARES)
+
+    collector.collect()
+
+    assert limits(runtime, container_id) == (main.CONTAINER_CPU_QUOTA, main.CONTAINER_CPU_SHARES)
@@ -0,0 +1,96 @@
+import collections
+import datetime
+import time
+
+import pytest
+
+import main
+
+
+def set_expiry(container_id: str, expires_at: float):
+    data = main.load_database()
+    for containers in data.values():
+        for container in containers:
+            if container["container_id"] == container_id:
+                container["expires_at"] = datetime.datetime.fromtimestamp(expires_at).isoformat()
+    main.save_database(data)
+    main.expiry_scheduler.schedule(container_id, expires_at)
+
+
+def test_sweep_removes_expired_and_orphaned_instances(runtime, deploy):
+    kept = deploy("1")
+    expired = deploy("2")
+    orphaned = deploy("3")
+    set_expiry(expired, time.time() - 1)
+    runtime.remove(orphaned, force=True)
+
+    main.expiry_scheduler.sweep()
+
+    assert main.get_container_info(kept) is not None
+    assert main.get_container_info(expired) is None
+    assert main.get_container_info(orphaned) is None
+    assert {c["id"] for c in runtime.list_containers(all=True)} == {kept}
+    assert [n["title"] for n in main.notifications] == ["⌛ Instance Expired"]
+    assert main.notifications[0]["user_ids"] == [2]
+
+
+def test_sweep_warns_once_before_expiry(runtime, deploy):
+    container_id = deploy("1")
+    set_expiry(container_id, time.time() + main.EXPIRY_WARNING / 2)
+
+    main.expiry_scheduler.sweep()
+    main.expiry_scheduler.sweep()
+
+    assert [n["title"] for n in main.notifications] == ["⌛ Instance Expiring Soon"]
+    assert main.get_container_info(container_id)["expiry_warned"] is True
+    assert runtime.status(container_id) == "running"
+
+
+def test_sweep_keeps_instance_whose_ttl_was_extended(runtime, deploy):
+    container_id = deploy("1")
+    main.expiry_scheduler.schedule(container_id, time.time() - 1)
+
+    main.expiry_scheduler.sweep()
+
+    assert main.get_container_info(container_id) is not None
+    assert runtime.status(container_id) == "running"
+
+
+def test_due_entries_survive_a_failed_container_listing(runtime, deploy, monkeypatch):
+    container_id = deploy("1")
+    set_expiry(container_id, time.time() - 1)
+
+    def unavailable(all=False):
+        raise main.docker.errors.APIError("daemon unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(runtime, "list_containers", unavailable)
+        with pytest.raises(main.docker.errors.APIError):
+            main.expiry_scheduler.sweep()
+
+    main.expiry_scheduler.sweep()
+
+    assert main.get_container_info(container_id) is None
+    assert runtime.list_containers(all=True) == []
+
+
+def test_record_is_kept_until_the_container_is_removed(runtime, deploy, monkeypatch):
+    container_id = deploy("1")
+    set_expiry(container_id, time.time() - 1)
+
+    def failing_remove(container_id, force=False):
+        raise main.docker.errors.APIError("removal in progress")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(runtime, "remove", failing_remove)
+        main.expiry_scheduler.sweep()
+
+    assert main.get_container_info(container_id) is not None
+    assert runtime.status(container_id) == "running"
+    assert main.notifications == collections.deque()
+
+    main.expiry_scheduler.sweep()
+
+    assert main.get_container_info(container_id) is None
+    assert runtime.list_containers(all=True) == []
+    assert [n["title"] for n in main.notifications] == ["⌛ Instance Expired"]
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import tempfile
+import threading
+
+import pytest
+
+import main
+
+
+def run_with_orchestrator(test):
+    """Run `test(client)` against a real orchestrator socket, as a shard worker would"""
+    async def run():
+        # Unix socket paths are limited to about 100 bytes, too short for pytest's tmp_path
+        path = f"{tempfile.mkdtemp(prefix='orchestrator-')}/orchestrator.sock"
+        server = await asyncio.start_unix_server(main.handle_orchestrator_connection, path=path, limit=main.IPC_LINE_LIMIT)
+        client = main.OrchestratorClient(path)
+        try:
+            async with server:
+                return await test(client)
+        finally:
+            if client.writer is not None:
+                client.writer.close()
+    return asyncio.run(run())
+
+
+def record_requests(client) -> list:
+    """Capture every request the client writes from now on"""
+    requests = []
+    write = client.writer.write
+
+    def recording_write(data):
+        requests.append(json.loads(data))
+        write(data)
+
+    client.writer.write = recording_write
+    return requests
+
+
+def test_calls_round_trip(runtime):
+    image = main.DOCKER_IMAGES[next(iter(main.DOCKER_IMAGES))]["name"]
+
+    async def test(client):
+        container_id = await client.call("run_container", image, "1")
+        await client.call("add_to_database", "1", container_id, "ssh test@tmate.io", next(iter(main.DOCKER_IMAGES)))
+        results = await asyncio.gather(*(client.call("get_container_info", container_id[:12]) for _ in range(20)))
+        return container_id, results
+
+    container_id, results = run_with_orchestrator(test)
+    assert all(result["container_id"] == container_id and result["user_id"] == "1" for result in results)
+
+
+def test_errors_keep_their_type(runtime):
+    async def test(client):
+        await client.call("container_action", "0" * 64, "stop")
+
+    with pytest.raises(main.docker.errors.NotFound):
+        run_with_orchestrator(test)
+
+
+def test_finished_stream_sends_no_cancel(runtime, deploy):
+    container_id = deploy("1")
+
+    async def test(client):
+        await client.call("count_all_containers")
+        requests = record_requests(client)
+        chunks = [chunk async for chunk in client.stream("stream_logs", container_id, 5)]
+        await asyncio.sleep(0.05)
+        return chunks, requests, dict(client.streams)
+
+    chunks, requests, streams = run_with_orchestrator(test)
+    assert "".join(chunks).count("\n") == 5
+    assert [request.get("cancel") for request in requests] == [None]
+    assert streams == {}
+
+
+def test_early_exit_cancels_the_producer(runtime, monkeypatch):
+    stopped = threading.Event()
+
+    def endless(cancelled):
+        try:
+            while not cancelled.is_set():
+                yield "tick\n"
+        finally:
+            stopped.set()
+
+    monkeypatch.setitem(main.ORCHESTRATOR_STREAMS, "endless", endless)
+
+    async def test(client):
+        await client.call("count_all_containers")
+        requests = record_requests(client)
+        stream = client.stream("endless")
+        async for _ in stream:
+            break
+        await stream.aclose()
+        await asyncio.get_running_loop().run_in_executor(None, stopped.wait, 5)
+        return requests
+
+    requests = run_with_orchestrator(test)
+    assert [request.get("cancel") for request in requests] == [None, True]
+    assert stopped.is_set()
+
+
+def test_stream_errors_keep_their_type(runtime):
+    async def test(client):
+        async for _ in client.stream("stream_logs", "0" * 64, 5):
+            pass
+
+    with pytest.raises(main.docker.errors.NotFound):
+        run_with_orchestrator(test)
@@ -0,0 +1,76 @@
+import pytest
+
+import main
+
+
+@pytest.fixture
+def volume(runtime, deploy, tmp_path, monkeypatch):
+    """The volume of user 1, backed by a readable directory, with a 1MB quota and no host disk pressure"""
+    monkeypatch.setattr(main, "VOLUME_QUOTA_BYTES", 1024 * 1024)
+    monkeypatch.setattr(main, "HOST_DISK_RESERVE_BYTES", 0)
+    deploy("1")
+    mountpoint = tmp_path / "volume"
+    mountpoint.mkdir()
+    return {**runtime.list_volumes(main.VOLUME_LABEL)[0], "mountpoint": str(mountpoint)}
+
+
+def write(volume, name: str, size: int):
+    with open(f"{volume['mountpoint']}/{name}", "wb") as f:
+        f.write(b"x" * size)
+
+
+def statuses(runtime):
+    return [container["status"] for container in runtime.list_containers(all=True)]
+
+
+def test_exceeding_quota_stops_running_instances(runtime, volume):
+    write(volume, "data", 2 * 1024 * 1024)
+
+    main.volume_tracker.measure(volume)
+
+    assert statuses(runtime) == ["exited"]
+    assert [c["status"] for c in main.get_user_containers("1")] == ["stopped"]
+    assert main.check_storage("1") is not None
+    assert [n["title"] for n in main.notifications] == ["💾 Storage Quota Exceeded"]
+
+
+def test_one_grace_period_to_free_up_space(runtime, volume):
+    write(volume, "data", 2 * 1024 * 1024)
+    main.volume_tracker.measure(volume)
+    container_id = main.get_user_containers("1")[0]["container_id"]
+
+    assert main.check_storage("1", "start") is None
+    main.container_action(container_id, "start")
+    main.volume_tracker.measure(volume)
+    assert statuses(runtime) == ["running"]
+
+    # Once the grace period is over the instance is stopped again and can't be restarted
+    main.volume_tracker.grace[main.user_volume_name("1")] = 0
+    main.volume_tracker.measure(volume)
+    assert statuses(runtime) == ["exited"]
+    assert main.check_storage("1", "start") is not None
+
+
+def test_freeing_space_lifts_the_block_and_resets_grace(runtime, volume):
+    write(volume, "data", 2 * 1024 * 1024)
+    main.volume_tracker.measure(volume)
+    main.check_storage("1", "start")
+
+    write(volume, "data", 0)
+    main.volume_tracker.measure(volume)
+
+    assert main.check_storage("1") is None
+    assert main.volume_tracker.grace == {}
+
+
+def test_growing_volume_is_stopped_when_host_disk_is_low(runtime, volume, monkeypatch):
+    main.volume_tracker.measure(volume)
+    monkeypatch.setattr(main, "HOST_DISK_RESERVE_BYTES", 10 ** 18)
+
+    main.volume_tracker.measure(volume)
+    assert statuses(runtime) == ["running"]
+
+    write(volume, "data", 64 * 1024)
+    main.volume_tracker.measure(volume)
+    assert statuses(runtime) == ["exited"]
+    assert main.notifications[-1]["title"] == "💾 Host Disk Full"
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import main
+
+DISCORD_MESSAGE_LIMIT = 2000
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+
+    async def edit(self, content=None, **kwargs):
+        self.content = content
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        message = FakeMessage(content)
+        self.messages.append(message)
+        return message
+
+
+class FakeInteraction:
+    def __init__(self):
+        self.followup = FakeFollowup()
+
+
+async def from_list(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def paginate(chunks) -> list:
+    interaction = FakeInteraction()
+    asyncio.run(main.send_paginated(interaction, from_list(chunks)))
+    return [message.content for message in interaction.followup.messages]
+
+
+def unescape(page: str) -> str:
+    assert page.startswith("```\n") and page.endswith("\n```")
+    return page[4:-4].replace("`\u200b", "`")
+
+
+def test_pages_fit_discord_limit_after_escaping():
+    output = "```" * 2000 + "tail"
+    pages = paginate([output[i:i + 700] for i in range(0, len(output), 700)])
+
+    assert len(pages) > 1
+    assert all(len(page) <= DISCORD_MESSAGE_LIMIT for page in pages)
+    assert all("``" not in page[4:-4] for page in pages)
+    assert "".join(unescape(page) for page in pages) == output
+
+
+def test_plain_output_is_split_into_full_pages():
+    output = "".join(f"line {n}\n" for n in range(1000))
+    pages = paginate([output])
+
+    assert [len(page[4:-4]) for page in pages[:-1]] == [main.STREAM_PAGE_CHARS] * (len(pages) - 1)
+    assert "".join(unescape(page) for page in pages) == output
+
+
+def test_empty_stream_says_so():
+    assert paginate([]) == [main.code_block("(no output)")]
+
+
+def test_output_is_capped_at_max_bytes(monkeypatch):
+    monkeypatch.setattr(main, "STREAM_MAX_BYTES", 100)
+    text = "".join(main.capped_output(iter([b"x" * 60] * 5), threading.Event()))
+
+    assert text.startswith("x" * 100)
+    assert text.endswith("[output truncated at 0KB]")
+
+
+def test_capping_keeps_split_utf8_intact():
+    text = "".join(main.capped_output(iter(["é".encode()[:1], "é".encode()[1:]]), threading.Event()))
+    assert text == "é"
+
+
+def test_cancelled_stream_stops_reading():
+    cancelled = threading.Event()
+    read = []
+
+    def chunks():
+        for n in range(100):
+            read.append(n)
+            if n == 2:
+                cancelled.set()
+            yield b"chunk\n"
+
+    "".join(main.capped_output(chunks(), cancelled))
+    assert read == [0, 1, 2]
+
+
+def test_logs_and_exec_stream_from_the_runtime(runtime, deploy):
+    container_id = deploy("1")
+    logs = "".join(main.stream_logs(threading.Event(), container_id, 3))
+    output = "".join(main.stream_exec(threading.Event(), container_id, "uptime"))
+
+    assert logs.splitlines() == [f"{container_id[:12]} line {n}" for n in range(3)]
+    assert len(output.splitlines()) == runtime.exec_output_lines
@@ -0,0 +1,85 @@
+import os
+
+import main
+
+
+def open_store() -> main.UsageStore:
+    return main.UsageStore("usage.bin", "usage.json", 16, 60, 24)
+
+
+def test_collected_usage_survives_reopening(runtime, deploy):
+    store = main.usage_store
+    container_id = deploy("1")
+
+    collector = main.UsageCollector(main.USAGE_SAMPLE_INTERVAL, 2)
+    for _ in range(4):
+        collector.collect()
+
+    summary = store.summary(container_id, 3600)
+    history = store.history(container_id, 3600)
+    assert summary == {"cpu_avg": 10.0, "cpu_max": 10.0, "memory_avg": 4.17}
+    assert store.averages(3600) == {container_id: summary}
+    assert history
+
+    store.mmap.flush()
+    reopened = open_store()
+    assert reopened.summary(container_id, 3600) == summary
+    assert reopened.history(container_id, 3600) == history
+
+
+def test_released_slot_is_reused_without_old_history(runtime):
+    store = open_store()
+    store.record("a" * 64, 1_000_000, 50.0, 20.0)
+    store.release("a" * 64)
+    store.record("b" * 64, 1_000_000, 5.0, 2.0)
+
+    assert store.summary("a" * 64, 3600, now=1_000_000) is None
+    assert store.summary("b" * 64, 3600, now=1_000_000) == {"cpu_avg": 5.0, "cpu_max": 5.0, "memory_avg": 2.0}
+    assert open_store().container_slots == {"b" * 64: 0}
+
+
+def test_slots_of_vanished_containers_are_released(runtime, deploy, monkeypatch):
+    store = main.UsageStore("small.bin", "small.json", 2, 60, 24)
+    monkeypatch.setattr(main, "usage_store", store)
+    collector = main.UsageCollector(main.USAGE_SAMPLE_INTERVAL, 2)
+
+    for user_id in ("1", "2", "3"):
+        container_id = deploy(user_id)
+        collector.collect()
+        collector.collect()
+        # Removed behind the bot's back, its record stays until the next sweep
+        runtime.remove(container_id, force=True)
+        collector.collect()
+
+    assert store.container_slots == {}
+    last = deploy("4")
+    collector.collect()
+    collector.collect()
+    assert last in store.container_slots
+
+
+def test_corrupt_index_does_not_prevent_opening(runtime):
+    store = open_store()
+    store.record("a" * 64, 1_000_000, 50.0, 20.0)
+    store.mmap.flush()
+    with open("usage.json", "w") as f:
+        f.write('{"aaaa')
+
+    reopened = open_store()
+
+    assert reopened.container_slots == {}
+    reopened.record("b" * 64, 1_000_000, 5.0, 2.0)
+    assert reopened.summary("b" * 64, 60, now=1_000_000) == {"cpu_avg": 5.0, "cpu_max": 5.0, "memory_avg": 2.0}
+    assert not os.path.exists("usage.json.tmp")
+
+
+def test_hour_windows_cover_whole_hours_and_agree_with_summary(runtime):
+    store = open_store()
+    now = 1_000_000 * 3600 + 1800
+    store.record("a" * 64, now - 3600, 90.0, 50.0)
+    store.record("a" * 64, now, 10.0, 5.0)
+
+    assert store.averages(3600, now=now)["a" * 64]["cpu_avg"] == 10.0
+    assert store.averages(2 * 3600, now=now)["a" * 64]["cpu_avg"] == 50.0
+    for window in (60, 3600, 86400):
+        assert store.summary("a" * 64, window, now=now) == store.averages(window, now=now)["a" * 64]